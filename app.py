@@ -4,8 +4,22 @@ import plotly.graph_objects as go
 import requests
 import json
 from datetime import datetime, timedelta
-import time
 import numpy as np
+import io
+import os
+import http_client
+from swr_cache import SWRCache
+from locations import DEFAULT_LOCATION
+from aqi import forecast_rows, get_aqi_info, pm25_to_aqi
+from prediction_index import LATEST_FILE, SNAPSHOT_FILE, index_path
+from rollups import rollup_path
+
+# Overridable so the dashboard can run against local stand-ins (see benchmarks/load_test.py)
+OPEN_METEO_URL = os.getenv("AQI_OPEN_METEO_URL", "https://air-quality-api.open-meteo.com/v1/air-quality")
+HUB_URL = os.getenv("AQI_HUB_URL", "https://huggingface.co")
+PREDICTIONS_BASE_URL = f"{HUB_URL}/Syed110-3/karachi-aqi-predictor/resolve/main"
+# Older snapshots mean the hourly job has stopped; show the live reading instead
+SNAPSHOT_MAX_AGE = timedelta(hours=2)
 
 # Page config
 st.set_page_config(
@@ -136,24 +150,21 @@ with st.sidebar:
     3. Full update displayed to users
     """)
 
-# Cache functions - BOTH update hourly
-@st.cache_data(ttl=3600)  # Cache for 1 hour - AQI updates hourly
+# Loaders for the shared dashboard cache - refreshed in the background after each hourly publish
 def get_current_aqi():
     """Get current AQI from Open-Meteo (hourly API)"""
     try:
-        url = "https://air-quality-api.open-meteo.com/v1/air-quality"
+        url = OPEN_METEO_URL
         params = {
             "latitude": 24.8607, 
             "longitude": 67.0011, 
             "current": "pm2_5",
             "timezone": "auto"
         }
-        response = requests.get(url, params=params, timeout=5)
-        data = response.json()
+        data = http_client.get_json(url, params=params, timeout=5)
         
         pm25 = data['current']['pm2_5']
-        aqi = round((pm25 / 35.4) * 100)
-        aqi = max(0, min(500, aqi))
+        aqi = int(pm25_to_aqi(pm25))
         
         # Get timestamp and round to nearest hour for consistency
         timestamp_str = data['current']['time']
@@ -170,91 +181,68 @@ def get_current_aqi():
         }
     except Exception as e:
         # Fallback to demo data if API fails
-        now_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
-        return {
-            "aqi": 85,
-            "pm25": 30.1,
-            "timestamp": now_hour.isoformat(),
-            "display_time": now_hour.strftime('%H:00 UTC'),
-            "location": "Karachi",
-            "source": "Fallback Data (API Error)"
-        }
+        return fallback_current("Fallback Data (API Error)")
+
+def fallback_current(source):
+    """Demo reading for the current hour"""
+    now_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    return {
+        "aqi": 85,
+        "pm25": 30.1,
+        "timestamp": now_hour.isoformat(),
+        "display_time": now_hour.strftime('%H:00 UTC'),
+        "location": "Karachi",
+        "source": source
+    }
+
+def demo_predictions(message):
+    return {
+        "status": "demo",
+        "timestamp": datetime.now().isoformat(),
+        "predictions": {
+            "day1": 88.5,
+            "day2": 90.2,
+            "day3": 92.8
+        },
+        "message": message
+    }
 
-# Predictions function with 90-second delay (KEPT SAME)
-@st.cache_data(ttl=3600)  # Cache for 1 hour - predictions update hourly
 def get_latest_predictions():
-    """Get latest predictions from Hugging Face with delay check"""
+    """Get latest predictions from Hugging Face"""
     now = datetime.now()
     
-    # Check if we should wait (if it's within 90 seconds of the hour)
-    if now.minute == 0 and now.second < 90:
-        return {"status": "waiting", "message": "Predictions being generated...", "retry_after": 90 - now.second}
-    
     try:
-        # Try to get the latest.json file first
-        latest_url = "https://huggingface.co/Syed110-3/karachi-aqi-predictor/resolve/main/predictions/latest.json"
-        
+        # latest.json is committed together with every prediction, so one
+        # small fetch normally resolves the newest forecast
         try:
-            response = requests.get(latest_url, timeout=15)
+            response = http_client.get(f"{PREDICTIONS_BASE_URL}/{LATEST_FILE}", timeout=15)
             if response.status_code == 200:
                 prediction_data = response.json()
-                
-                # Check if predictions are fresh (within last 2 hours)
-                if 'prediction_timestamp' in prediction_data:
-                    pred_time = datetime.fromisoformat(prediction_data['prediction_timestamp'].replace('Z', '+00:00'))
-                    hours_old = (now - pred_time).total_seconds() / 3600
-                    
-                    if hours_old < 2:
-                        # Ensure all values are proper floats
-                        if 'predictions' in prediction_data:
-                            for key in prediction_data['predictions']:
-                                prediction_data['predictions'][key] = float(prediction_data['predictions'][key])
-                        prediction_data['status'] = "success"
-                        return prediction_data
-                
-                # If no timestamp or old, fall through to search for latest
+                # Ensure all values are proper floats
+                if 'predictions' in prediction_data:
+                    for key in prediction_data['predictions']:
+                        prediction_data['predictions'][key] = float(prediction_data['predictions'][key])
+                prediction_data['status'] = "success"
+                return prediction_data
         except:
             pass
         
-        # Fallback: Search for most recent prediction file
-        api_url = "https://huggingface.co/api/models/Syed110-3/karachi-aqi-predictor/tree/main/predictions"
-        response = requests.get(api_url, timeout=10)
-        
-        if response.status_code == 200:
-            files = response.json()
-            
-            # Find all prediction JSON files
-            pred_files = []
-            for item in files:
-                if isinstance(item, dict) and 'path' in item:
-                    if 'pred_' in item['path'] and item['path'].endswith('.json'):
-                        pred_files.append(item)
+        # Fallback: newest entry in today's (or yesterday's) prediction index
+        for date in [now, now - timedelta(days=1)]:
+            try:
+                response = http_client.get(f"{PREDICTIONS_BASE_URL}/{index_path(date.strftime('%Y-%m-%d'))}", timeout=10)
+                entries = response.json()
+            except:
+                continue
             
-            if pred_files:
-                # Get most recent file (sorted by filename which contains timestamp)
-                pred_files.sort(key=lambda x: x['path'], reverse=True)
-                latest_file = pred_files[0]['path']
-                
-                # Download the latest prediction file
-                file_url = f"https://huggingface.co/Syed110-3/karachi-aqi-predictor/resolve/main/{latest_file}"
-                pred_response = requests.get(file_url, timeout=10)
-                
-                if pred_response.status_code == 200:
-                    prediction_data = pred_response.json()
-                    prediction_data['status'] = "success"
-                    return prediction_data
+            if entries:
+                pred_response = http_client.get(f"{PREDICTIONS_BASE_URL}/{entries[-1]['path']}", timeout=10)
+                prediction_data = pred_response.json()
+                prediction_data['status'] = "success"
+                return prediction_data
         
         # If everything fails, return demo data
-        return {
-            "status": "demo",
-            "timestamp": now.isoformat(),
-            "predictions": {
-                "day1": 88.5,
-                "day2": 90.2,
-                "day3": 92.8
-            },
-            "message": "Using demo predictions - check back after the hour"
-        }
+        return demo_predictions("Using demo predictions - check back after the hour")
                 
     except Exception as e:
         return {
@@ -268,62 +256,81 @@ def get_latest_predictions():
             }
         }
 
-# Function to get AQI level information
-def get_aqi_info(aqi):
-    """Get AQI level, color, icon, and health message"""
-    if aqi <= 50:
-        return {
-            "level": "GOOD",
-            "color": "#10B981",
-            "icon": "✅",
-            "health": "Air quality is satisfactory.",
-            "advice": "Ideal for outdoor activities. No restrictions needed.",
-            "color_class": "aqi-good"
-        }
-    elif aqi <= 100:
-        return {
-            "level": "MODERATE", 
-            "color": "#F59E0B",
-            "icon": "⚠️",
-            "health": "Acceptable air quality.",
-            "advice": "Sensitive individuals should limit outdoor exertion.",
-            "color_class": "aqi-moderate"
-        }
-    elif aqi <= 150:
-        return {
-            "level": "UNHEALTHY",
-            "color": "#EF4444",
-            "icon": "🚨",
-            "health": "Unhealthy for sensitive groups.",
-            "advice": "Children, elderly, and those with respiratory issues should avoid outdoor activities.",
-            "color_class": "aqi-unhealthy"
-        }
-    elif aqi <= 200:
-        return {
-            "level": "VERY UNHEALTHY",
-            "color": "#8B5CF6",
-            "icon": "😷",
-            "health": "Unhealthy for everyone.",
-            "advice": "Everyone should avoid outdoor activities. Close windows, use air purifiers.",
-            "color_class": "aqi-very-unhealthy"
-        }
-    else:
-        return {
-            "level": "HAZARDOUS",
-            "color": "#7C3AED",
-            "icon": "☣️",
-            "health": "Health warning: emergency conditions.",
-            "advice": "Everyone should avoid all outdoor activities. Stay indoors with air purifiers.",
-            "color_class": "aqi-hazardous"
+def get_rollups(period):
+    """Daily or weekly rollup table published by the hourly job (None if unavailable)"""
+    try:
+        response = http_client.get(f"{PREDICTIONS_BASE_URL}/{rollup_path(period)}", timeout=15)
+        return pd.read_parquet(io.BytesIO(response.content))
+    except Exception:
+        return None
+
+def snapshot_recent(snapshot):
+    generated = datetime.fromisoformat(snapshot['generated_at'].replace('Z', '+00:00')).replace(tzinfo=None)
+    return datetime.now() - generated <= SNAPSHOT_MAX_AGE
+
+def get_dashboard_data():
+    """Snapshot published by the hourly job; falls back to the live reading and latest predictions
+    when the snapshot is missing or older than SNAPSHOT_MAX_AGE"""
+    try:
+        snapshot = http_client.get_json(f"{PREDICTIONS_BASE_URL}/{SNAPSHOT_FILE}", timeout=15)
+        if snapshot_recent(snapshot):
+            snapshot['source'] = "snapshot"
+            return snapshot
+    except Exception:
+        pass
+    
+    current = get_current_aqi()
+    current['info'] = get_aqi_info(current['aqi'])
+    predictions = get_latest_predictions()
+    return {
+        'current': current,
+        'predictions': predictions,
+        'forecast': forecast_rows(current['aqi'], predictions.get('predictions', {})),
+        'source': "live"
+    }
+
+def fallback_dashboard():
+    """Demo payload for a render that finds no dashboard loaded yet (e.g. a slow first load)"""
+    current = fallback_current("Fallback Data (still loading)")
+    current['info'] = get_aqi_info(current['aqi'])
+    predictions = demo_predictions("Forecasts are still loading - refresh in a moment")
+    return {
+        'current': current,
+        'predictions': predictions,
+        'forecast': forecast_rows(current['aqi'], predictions['predictions']),
+        'source': "fallback"
+    }
+
+def predictions_fresh(data):
+    """Predictions are fresh once the current hour's run has published them"""
+    if data.get('status') != 'success' or 'prediction_timestamp' not in data:
+        return False
+    generated = datetime.fromisoformat(data['prediction_timestamp'].replace('Z', '+00:00')).replace(tzinfo=None)
+    return generated >= datetime.now().replace(minute=0, second=0, microsecond=0)
+
+@st.cache_resource
+def get_dashboard_cache():
+    """One stale-while-revalidate cache per server process, shared by every session"""
+    return SWRCache(
+        {
+            'dashboard': get_dashboard_data,
+            'rollups_daily': lambda: get_rollups('daily'),
+            'rollups_weekly': lambda: get_rollups('weekly')
+        },
+        fresh={
+            'dashboard': lambda data: (predictions_fresh(data['predictions'])
+                                       and not data['current']['source'].startswith('Fallback'))
         }
+    ).start()
 
-# Get current AQI (hourly)
-current_data = get_current_aqi()
-current_aqi = current_data['aqi']
-aqi_info = get_aqi_info(current_aqi)
+dashboard_cache = get_dashboard_cache()
 
-# Get predictions with delay logic
-predictions = get_latest_predictions()
+# Current AQI, predictions and forecast rows all come from the same hourly run
+dashboard = dashboard_cache.get('dashboard') or fallback_dashboard()
+current_data = dashboard['current']
+current_aqi = current_data['aqi']
+aqi_info = current_data['info']
+predictions = dashboard['predictions']
 
 # Calculate timing info
 now = datetime.now()
@@ -333,12 +340,10 @@ predictions_available_time = next_hour_start + timedelta(seconds=90)
 
 # Determine if we should show loading state for predictions
 show_loading = False
-if now.minute == 0 and now.second < 90:
+seconds_into_hour = now.minute * 60 + now.second
+if seconds_into_hour < 90 and not predictions_fresh(predictions):
     show_loading = True
-    seconds_remaining = 90 - now.second
-elif predictions.get('status') == 'waiting':
-    show_loading = True
-    seconds_remaining = predictions.get('retry_after', 90)
+    seconds_remaining = 90 - seconds_into_hour
 
 # Hourly update badge
 minutes_until_next_hour = 60 - now.minute
@@ -474,32 +479,18 @@ if show_loading:
     
     **Available in:** {seconds_remaining} seconds
     
-    **Note:** The page will refresh automatically when ready.
+    **Note:** Reload the page after :01:30 to see the new forecast.
     """)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
 elif predictions.get('status') in ['success', 'demo', 'error'] and 'predictions' in predictions:
-    # SHOW ACTUAL PREDICTIONS
-    # Prepare forecast data
-    days = ['Current Hour', 'Next 24h', 'Next 48h', 'Next 72h']
-    
-    # Get values
-    values = [current_aqi]
-    for i in range(1, 4):
-        day_key = f'day{i}'
-        if day_key in predictions['predictions']:
-            values.append(float(predictions['predictions'][day_key]))
-        else:
-            values.append(float(current_aqi) + i * 3)
-    
-    # Create colors and info for each day
-    colors = []
-    levels = []
-    for value in values:
-        info = get_aqi_info(value)
-        colors.append(info['color'])
-        levels.append(info['level'])
+    # SHOW ACTUAL PREDICTIONS (rows are precomputed with the snapshot)
+    forecast = dashboard['forecast']
+    days = [row['period'] for row in forecast]
+    values = [row['aqi'] for row in forecast]
+    colors = [row['color'] for row in forecast]
+    levels = [row['level'] for row in forecast]
     
     # Forecast chart
     col_chart, col_table = st.columns([2, 1])
@@ -538,25 +529,17 @@ elif predictions.get('status') in ['success', 'demo', 'error'] and 'predictions'
         st.markdown("### Forecast Details")
         
         forecast_data = []
-        for i, (day, value, level, color) in enumerate(zip(days, values, levels, colors)):
-            if i == 0:
-                forecast_data.append({
-                    'Period': day,
-                    'AQI': f"{value:.0f}",
-                    'Level': level,
-                    'PM2.5': f"{(value * 0.354):.1f} µg/m³",
-                    'Status': 'Current Hourly'
-                })
-            else:
-                change = value - current_aqi
-                forecast_data.append({
-                    'Period': day,
-                    'AQI': f"{value:.0f}",
-                    'Level': level,
-                    'Change': f"{change:+.0f}",
-                    'PM2.5': f"{(value * 0.354):.1f} µg/m³",
-                    'Status': 'AI Forecast'
-                })
+        for row in forecast:
+            entry = {
+                'Period': row['period'],
+                'AQI': f"{row['aqi']:.0f}",
+                'Level': row['level'],
+                'PM2.5': f"{row['pm25']:.1f} µg/m³",
+                'Status': row['status']
+            }
+            if row['change'] is not None:
+                entry['Change'] = f"{row['change']:+.0f}"
+            forecast_data.append(entry)
         
         forecast_df = pd.DataFrame(forecast_data)
         st.dataframe(
@@ -597,7 +580,70 @@ else:
     - AI Predictions: ⏳ Generating on schedule
     """)
 
-# Row 3: System Architecture
+# Row 3: History from the pre-aggregated rollups
+st.markdown("---")
+st.markdown("## 📉 AQI History")
+
+col_period, col_location = st.columns([1, 2])
+with col_period:
+    period = st.radio("Period", ["daily", "weekly"], horizontal=True, format_func=str.title)
+history = dashboard_cache.get(f'rollups_{period}')
+
+if history is None or history.empty:
+    st.info("ℹ️ History charts appear once the hourly job has published its first rollups")
+else:
+    location_names = sorted(history['location'].unique())
+    with col_location:
+        location = st.selectbox(
+            "Location",
+            location_names,
+            index=location_names.index(DEFAULT_LOCATION) if DEFAULT_LOCATION in location_names else 0
+        )
+    rows = history[history['location'] == location].sort_values('period')
+    dates = pd.to_datetime(rows['period'], unit='s')
+    
+    col_trend, col_error = st.columns([2, 1])
+    
+    with col_trend:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=dates, y=rows['aqi_max'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(
+            x=dates, y=rows['aqi_min'], fill='tonexty', fillcolor='rgba(30,58,138,0.15)',
+            line=dict(width=0), name='Min-Max'
+        ))
+        fig.add_trace(go.Scatter(x=dates, y=rows['aqi_mean'], name='Mean', line=dict(color='#1E3A8A', width=2)))
+        fig.add_trace(go.Scatter(x=dates, y=rows['aqi_p95'], name='95th percentile', line=dict(color='#EF4444', dash='dot')))
+        fig.update_layout(
+            height=400,
+            yaxis_title="AQI",
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            yaxis=dict(gridcolor='rgba(0,0,0,0.1)'),
+            legend=dict(orientation='h'),
+            font=dict(size=14)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col_error:
+        st.markdown("### Forecast Error (MAE)")
+        error_fig = go.Figure()
+        for day in [1, 2, 3]:
+            counts = rows[f'error_count_day{day}'].replace(0, np.nan)
+            error_fig.add_trace(go.Scatter(x=dates, y=rows[f'abs_error_sum_day{day}'] / counts, name=f'Day {day}'))
+        error_fig.update_layout(
+            height=400,
+            yaxis_title="Mean absolute error (AQI)",
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            legend=dict(orientation='h')
+        )
+        st.plotly_chart(error_fig, use_container_width=True)
+        
+        latest = rows.iloc[-1]
+        st.markdown(f"**PM2.5 this {'week' if period == 'weekly' else 'day'}:** "
+                    f"{latest['pm2_5_mean']:.1f} µg/m³ mean, {latest['pm2_5_p95']:.1f} µg/m³ p95")
+
+# Row 4: System Architecture
 st.markdown("---")
 st.markdown("## 🔧 System Architecture")
 
@@ -662,7 +708,7 @@ with col_info3:
     - Real-time status monitoring
     - Health recommendations
     - Forecast visualizations
-    - Auto-refresh logic
+    - Background refresh at :01:30
     """)
 
 # Footer
@@ -693,15 +739,6 @@ with col_footer1:
 
 # Remove refresh button entirely - updates are hourly only
 
-# Add auto-refresh logic for the loading window
-if show_loading:
-    # Set a timer to auto-refresh after the waiting period
-    if seconds_remaining <= 10:
-        # If less than 10 seconds remaining, refresh now
-        time.sleep(2)
-        st.cache_data.clear()
-        st.rerun()
-
 # Debug section
 with st.expander("🔧 Debug & Raw Data"):
     tab1, tab2, tab3 = st.tabs(["Hourly AQI", "Predictions", "System"])
@@ -714,17 +751,19 @@ with st.expander("🔧 Debug & Raw Data"):
         st.write(f"Current time: {now}")
         st.write(f"Current hour start: {current_hour_start}")
         st.write(f"Next hour start: {next_hour_start}")
-        st.write(f"Cache TTL: 3600 seconds (1 hour)")
+        st.write("Shared cache (refreshed at :01:30 each hour):")
+        st.json({key: {'loaded_at': str(info['loaded_at']), 'error': info['error']}
+                 for key, info in dashboard_cache.status().items()})
         
         # Test API
         if st.button("Test Open-Meteo API"):
-            test_url = "https://air-quality-api.open-meteo.com/v1/air-quality?latitude=24.8607&longitude=67.0011&current=pm2_5&timezone=auto"
-            response = requests.get(test_url, timeout=5)
+            test_params = {"latitude": 24.8607, "longitude": 67.0011, "current": "pm2_5", "timezone": "auto"}
+            response = requests.get(OPEN_METEO_URL, params=test_params, timeout=5)
             st.write("Status:", response.status_code)
             st.json(response.json())
     
     with tab2:
-        st.write("### AI Forecast Data")
+        st.write(f"### AI Forecast Data (from {dashboard.get('source', 'live')})")
         st.json(predictions)
         
         st.write("### Prediction Timing")
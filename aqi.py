@@ -0,0 +1,113 @@
+"""PM2.5 -> AQI conversion, AQI classification and forecast rows shared by the hourly job and the dashboard."""
+import numpy as np
+
+# US EPA PM2.5 breakpoints (pre-2024 table): concentration low/high (µg/m³) -> AQI low/high
+PM25_BREAKPOINTS = np.array([
+    [0.0, 12.0, 0, 50],
+    [12.1, 35.4, 51, 100],
+    [35.5, 55.4, 101, 150],
+    [55.5, 150.4, 151, 200],
+    [150.5, 250.4, 201, 300],
+    [250.5, 350.4, 301, 400],
+    [350.5, 500.4, 401, 500]
+])
+
+# Upper AQI bound (inclusive) -> display info, in increasing order
+AQI_LEVELS = [
+    (50, {
+        "level": "GOOD",
+        "color": "#10B981",
+        "icon": "✅",
+        "health": "Air quality is satisfactory.",
+        "advice": "Ideal for outdoor activities. No restrictions needed.",
+        "color_class": "aqi-good"
+    }),
+    (100, {
+        "level": "MODERATE",
+        "color": "#F59E0B",
+        "icon": "⚠️",
+        "health": "Acceptable air quality.",
+        "advice": "Sensitive individuals should limit outdoor exertion.",
+        "color_class": "aqi-moderate"
+    }),
+    (150, {
+        "level": "UNHEALTHY",
+        "color": "#EF4444",
+        "icon": "🚨",
+        "health": "Unhealthy for sensitive groups.",
+        "advice": "Children, elderly, and those with respiratory issues should avoid outdoor activities.",
+        "color_class": "aqi-unhealthy"
+    }),
+    (200, {
+        "level": "VERY UNHEALTHY",
+        "color": "#8B5CF6",
+        "icon": "😷",
+        "health": "Unhealthy for everyone.",
+        "advice": "Everyone should avoid outdoor activities. Close windows, use air purifiers.",
+        "color_class": "aqi-very-unhealthy"
+    }),
+    (float('inf'), {
+        "level": "HAZARDOUS",
+        "color": "#7C3AED",
+        "icon": "☣️",
+        "health": "Health warning: emergency conditions.",
+        "advice": "Everyone should avoid all outdoor activities. Stay indoors with air purifiers.",
+        "color_class": "aqi-hazardous"
+    })
+]
+
+FORECAST_PERIODS = ['Current Hour', 'Next 24h', 'Next 48h', 'Next 72h']
+
+
+def pm25_to_aqi(pm25, breakpoints=PM25_BREAKPOINTS):
+    """AQI for a scalar or array of PM2.5 concentrations, NaN where the input is NaN.
+
+    Concentrations are truncated to 0.1 µg/m³ as the EPA specifies, located in
+    the breakpoint table with one searchsorted and linearly interpolated.
+    Values above the table are capped at its top AQI.
+    """
+    c = np.asarray(pm25, dtype='float64')
+    c = np.clip(np.floor(c * 10 + 1e-9) / 10, 0, breakpoints[-1, 1])
+    segment = np.minimum(np.searchsorted(breakpoints[:, 1], c), len(breakpoints) - 1)
+    c_low, c_high, i_low, i_high = breakpoints[segment].T
+    return np.round((i_high - i_low) / (c_high - c_low) * (c - c_low) + i_low)
+
+
+def aqi_to_pm25(aqi, breakpoints=PM25_BREAKPOINTS):
+    """Lowest PM2.5 concentration for a scalar or array of AQI values (inverse of pm25_to_aqi)"""
+    i = np.clip(np.asarray(aqi, dtype='float64'), 0, breakpoints[-1, 3])
+    segment = np.minimum(np.searchsorted(breakpoints[:, 3], i), len(breakpoints) - 1)
+    c_low, c_high, i_low, i_high = breakpoints[segment].T
+    return (c_high - c_low) / (i_high - i_low) * (i - i_low) + c_low
+
+
+def get_aqi_info(aqi):
+    """Get AQI level, color, icon, and health message"""
+    for upper, info in AQI_LEVELS:
+        if aqi <= upper:
+            return dict(info)
+
+
+def forecast_rows(current_aqi, predictions):
+    """Chart/table rows for the current hour and the day 1-3 forecasts"""
+    values = [float(current_aqi)]
+    for i in range(1, 4):
+        day_key = f'day{i}'
+        if day_key in predictions:
+            values.append(float(predictions[day_key]))
+        else:
+            values.append(float(current_aqi) + i * 3)
+
+    rows = []
+    for i, (period, value) in enumerate(zip(FORECAST_PERIODS, values)):
+        info = get_aqi_info(value)
+        rows.append({
+            'period': period,
+            'aqi': value,
+            'level': info['level'],
+            'color': info['color'],
+            'change': None if i == 0 else value - float(current_aqi),
+            'pm25': float(aqi_to_pm25(value)),
+            'status': 'Current Hourly' if i == 0 else 'AI Forecast'
+        })
+    return rows
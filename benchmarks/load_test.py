@@ -0,0 +1,248 @@
+"""Load test for the Streamlit dashboard against local stand-ins for its upstreams.
+
+    python benchmarks/load_test.py                                 # 200 sessions over 4 workers
+    python benchmarks/load_test.py --sessions 1000 --concurrency 8 --latency 0.5
+    python benchmarks/load_test.py --fixtures local_store/model    # serve a real model repo tree
+
+A stub HTTP server stands in for Open-Meteo (/v1/air-quality) and the Hub's
+resolve/ and api/.../tree/ endpoints; app.py is pointed at it through
+AQI_OPEN_METEO_URL and AQI_HUB_URL. By default the served files (dashboard
+snapshot, latest.json, day index, rollups) are generated from synthetic
+history with the same code the hourly job uses, at pollution-spike levels.
+Sessions are rendered with Streamlit's AppTest. AppTest runs cannot overlap
+within one interpreter, so concurrency comes from worker processes: each
+worker plays one dashboard server process, with its own process-wide caches,
+rendering its share of the sessions back to back. The report gives
+p50/p95/p99 render latency (and the slowest first render per worker, which
+pays for the cold cache), upstream requests per endpoint and peak RSS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import streamlit.logger
+from streamlit.testing.v1 import AppTest
+
+import rollups
+from aqi import pm25_to_aqi
+from features import build_feature_row
+from locations import DEFAULT_LOCATION
+from prediction_index import manifest_files
+from run_benchmarks import RESULTS_DIR, git_commit
+from synthetic import generate_history
+
+APP_PATH = os.path.join(ROOT, "app.py")
+REPO_ID = "Syed110-3/karachi-aqi-predictor"
+SPIKE_PM25 = 180.0
+
+# AppTest runs in bare mode and would otherwise warn about the missing script context on every render
+streamlit.logger.set_log_level("error")
+
+
+def write_fixtures(directory, pm25=SPIKE_PM25):
+    """Generate the model-repo files the dashboard reads, as the hourly job would publish them"""
+    run_time = datetime.now().replace(second=0, microsecond=0)
+    aqi = int(pm25_to_aqi(pm25))
+    features = build_feature_row(aqi, run_time.replace(minute=0).isoformat(), pm25, aqi - 40, location=DEFAULT_LOCATION)
+    predictions = {'day1': aqi * 0.95, 'day2': aqi * 0.9, 'day3': aqi * 0.85}
+    pred_data = {
+        'timestamp': features['timestamp'],
+        'location': DEFAULT_LOCATION,
+        'predictions': predictions,
+        'features': features,
+        'locations': {DEFAULT_LOCATION: {'features': features, 'predictions': predictions}},
+        'model_version': "loadtest",
+        'targets_updated': 0
+    }
+    files = manifest_files(pred_data, run_time, index_entries=[], model_names={'day1': "stub"})
+
+    history = generate_history(24 * 90)
+    state = rollups.update(rollups.empty_state(), history)
+    files.update(rollups.state_files(state))
+
+    for path, data in files.items():
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+    return sorted(files)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Open-Meteo current readings plus Hub resolve/tree over a fixture directory"""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        server = self.server
+        time.sleep(server.latency)
+
+        if path == "/v1/air-quality":
+            route = "open-meteo"
+            now = datetime.now().strftime('%Y-%m-%dT%H:00')
+            self._send(200, json.dumps({'current': {'time': now, 'pm2_5': server.pm25}}).encode())
+        elif f"/{REPO_ID}/resolve/main/" in path:
+            route = "hub-resolve"
+            local = os.path.join(server.fixtures, path.split("/resolve/main/", 1)[1])
+            if os.path.isfile(local):
+                with open(local, 'rb') as f:
+                    self._send(200, f.read())
+            else:
+                self._send(404, b'{"error": "Entry not found"}')
+        elif f"/api/models/{REPO_ID}/tree/main" in path:
+            route = "hub-tree"
+            prefix = path.split("/tree/main", 1)[1].strip("/")
+            base = os.path.join(server.fixtures, prefix)
+            entries = []
+            if os.path.isdir(base):
+                for name in sorted(os.listdir(base)):
+                    full = os.path.join(base, name)
+                    entries.append({
+                        'type': 'directory' if os.path.isdir(full) else 'file',
+                        'path': f"{prefix}/{name}".strip("/"),
+                        'size': os.path.getsize(full)
+                    })
+            self._send(200, json.dumps(entries).encode())
+        else:
+            route = "other"
+            self._send(404, b"")
+
+        with server.lock:
+            server.counts[route] += 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(fixtures, latency=0.0, pm25=SPIKE_PM25):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.fixtures = fixtures
+    server.latency = latency
+    server.pm25 = pm25
+    server.counts = Counter()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def render_sessions(count, timeout=60):
+    """Worker: render `count` fresh sessions back to back; returns (latencies, failures, max RSS in kB)"""
+    latencies, failures = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        at.run()
+        latencies.append(time.perf_counter() - start)
+        failures += bool(at.exception)
+    return latencies, failures, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def run(sessions, concurrency, latency, fixtures=None):
+    tmpdir = None
+    if fixtures is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        fixtures = tmpdir.name
+        print(f"Generated fixtures: {', '.join(write_fixtures(fixtures))}")
+
+    server = start_stub(fixtures, latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    # Inherited by the spawned workers
+    os.environ["AQI_OPEN_METEO_URL"] = f"{base}/v1/air-quality"
+    os.environ["AQI_HUB_URL"] = base
+
+    shares = [sessions // concurrency + (i < sessions % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(concurrency) as pool:
+        results = pool.map(render_sessions, [n for n in shares if n])
+    elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+    latencies = [seconds for worker_latencies, _, _ in results for seconds in worker_latencies]
+    report = {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'upstream_latency_seconds': latency,
+        'failed_sessions': sum(failures for _, failures, _ in results),
+        'elapsed_seconds': elapsed,
+        'sessions_per_second': sessions / elapsed,
+        'latency_seconds': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': statistics.fmean(latencies),
+            'max': max(latencies),
+            'cold_start_max': max(worker_latencies[0] for worker_latencies, _, _ in results)
+        },
+        'upstream_requests': dict(server.counts),
+        'upstream_requests_per_session': sum(server.counts.values()) / sessions,
+        # ru_maxrss is in kilobytes on Linux
+        'max_worker_rss_mb': max(rss for _, _, rss in results) / 1e3
+    }
+    return report
+
+
+def print_report(report):
+    lat = report['latency_seconds']
+    print(f"\n{report['sessions']} sessions, {report['concurrency']} concurrent, "
+          f"{report['upstream_latency_seconds'] * 1000:.0f} ms upstream latency")
+    print(f"  render latency  p50 {lat['p50'] * 1000:8.1f} ms   p95 {lat['p95'] * 1000:8.1f} ms   "
+          f"p99 {lat['p99'] * 1000:8.1f} ms   max {lat['max'] * 1000:8.1f} ms   "
+          f"cold start {lat['cold_start_max'] * 1000:8.1f} ms")
+    print(f"  throughput      {report['sessions_per_second']:.1f} sessions/s, {report['failed_sessions']} failed")
+    print(f"  upstream        {report['upstream_requests']} "
+          f"({report['upstream_requests_per_session']:.3f} per session)")
+    print(f"  memory          max RSS per worker {report['max_worker_rss_mb']:.0f} MB")
+
+
+def save_report(report, path=None):
+    commit = git_commit()
+    path = path or os.path.join(RESULTS_DIR, f"load_{commit}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'commit': commit, 'created_at': datetime.now().isoformat(), 'report': report}, f, indent=2)
+    print(f"\nReport written to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the dashboard against local upstream stand-ins")
+    parser.add_argument("--sessions", type=int, default=200, help="dashboard sessions to render")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker processes rendering sessions in parallel")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the stub waits before each response")
+    parser.add_argument("--fixtures", help="directory laid out like the model repo to serve instead of generated files")
+    parser.add_argument("--output", help="report JSON path (default: benchmarks/results/load_<commit>.json)")
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.concurrency, args.latency, args.fixtures)
+    print_report(report)
+    save_report(report, args.output)
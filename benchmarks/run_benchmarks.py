@@ -0,0 +1,295 @@
+"""Offline benchmarks for the data preparation, storage and inference stages.
+
+    python benchmarks/run_benchmarks.py                       # 10k / 100k / 1M rows
+    python benchmarks/run_benchmarks.py --sizes 10000 --repeats 3
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/abc1234.json
+
+Each stage is timed over several repeats (median and min reported) and run once
+more under tracemalloc for its peak Python/NumPy allocation. Results go to
+benchmarks/results/<git commit>.json so runs can be diffed between commits.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import dataset_cache
+from daily_train import TRAINING_COLUMNS
+from dataset_store import load_history, shard_files, split_sealed, to_parquet_bytes, to_table
+from feature_store import RollingStore, build_store
+from features import FEATURE_COLUMNS, HOUR, TARGET_COLUMNS, TARGET_HORIZONS, build_features, fill_targets, first_unresolved
+from hourly_predict import feature_rows
+from model_bundle import build_bundle, save_bundle, validate_bundle
+from model_export import MANIFEST_FILE, export_files, load_artifact
+from model_selection import CANDIDATES, make_model
+from storage import LocalStorage
+from synthetic import generate_history
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+TRAINING_ROWS = 5_000
+RECENT_ROWS = 96
+# One shard per day makes seeding local storage slow for very long histories
+MAX_STORAGE_ROWS = 200_000
+
+
+def measure(fn, repeats):
+    """Median/min wall time over `repeats` calls plus the tracemalloc peak of one extra call"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'seconds_median': statistics.median(times),
+        'seconds_min': min(times),
+        'repeats': repeats,
+        'peak_mb': peak / 2**20
+    }
+
+
+def clear_targets(df, hours):
+    """Copy of df with the targets of the last `hours` rows unresolved, as before an hourly run"""
+    df = df.copy()
+    df.loc[df.index[-hours:], TARGET_COLUMNS] = np.nan
+    return df
+
+
+def train_bundles():
+    """One bundle per candidate model type, fitted on a small synthetic history"""
+    df = build_features(generate_history(TRAINING_ROWS)).dropna(subset=FEATURE_COLUMNS + TARGET_COLUMNS)
+    X = df[FEATURE_COLUMNS]
+    bundles = {}
+    for name in CANDIDATES:
+        models = {day: make_model(name).fit(X, df[f'target_day{day}']) for day in TARGET_HORIZONS}
+        infos = {
+            day: {'model_name': name, 'features': FEATURE_COLUMNS, 'target': f'target_day{day}', 'mae': 0.0}
+            for day in TARGET_HORIZONS
+        }
+        bundles[name] = build_bundle(models, infos, version=f"bench-{name}")
+    return bundles
+
+
+def history_stages(df):
+    """Stages whose cost depends on the history length"""
+    max_offset = max(TARGET_HORIZONS.values())
+    pending = clear_targets(df, max_offset + 1)
+    watermark = first_unresolved(pending)
+    recent = pending.tail(RECENT_ROWS).reset_index(drop=True)
+    pending_table = to_table(pending)
+    parquet = to_parquet_bytes(df)
+
+    # The live feature path: the saved rolling state is loaded, the lag is looked
+    # up in the recent shard and the reading is pushed into the ring buffer
+    state = build_store(df).to_json()
+    last = df.iloc[-1]
+    reading_time = pd.Timestamp(int(last['timestamp']) + HOUR, unit='s').isoformat()
+    readings = {last['location']: (int(last['aqi']), reading_time, float(last['pm2_5']))}
+
+    return {
+        'prepare_data': lambda: build_features(df.copy(), overwrite_targets=True).dropna(subset=FEATURE_COLUMNS + TARGET_COLUMNS),
+        'fill_target_values_full_scan': lambda: fill_targets(pending.copy()),
+        'fill_target_values_watermark': lambda: fill_targets(pending.copy(), start=watermark),
+        'fill_target_values_recent_shard': lambda: fill_targets(recent.copy()),
+        'split_sealed_full_history': lambda: split_sealed(pending_table),
+        'write_recent_shard': lambda: shard_files(recent),
+        'write_history_parquet': lambda: to_parquet_bytes(df),
+        'read_history_parquet': lambda: pd.read_parquet(io.BytesIO(parquet)),
+        'create_features': lambda: feature_rows(readings, recent, RollingStore.from_json(state))
+    }
+
+
+def storage_stages(df, tmpdir):
+    """Cold sync and warm history load through the local filesystem backend"""
+    storage = LocalStorage(os.path.join(tmpdir, f"store_{len(df)}"))
+    files, _, _ = shard_files(df)
+    storage.commit(files, "dataset", "Seed benchmark history")
+    cache_dir = os.path.join(tmpdir, f"cache_{len(df)}")
+    dataset_cache.sync(storage, cache_dir)
+
+    def cold_sync():
+        dataset_cache._manifests.clear()
+        dataset_cache._tables.clear()
+        dataset_cache.sync(storage, os.path.join(cache_dir, str(time.perf_counter_ns())))
+
+    def warm_load():
+        dataset_cache._tables.clear()
+        dataset_cache.CACHE_DIR = cache_dir
+        dataset_cache.sync(storage, cache_dir, refresh=True)
+        load_history(storage)
+
+    def warm_load_training():
+        dataset_cache._tables.clear()
+        dataset_cache.CACHE_DIR = cache_dir
+        dataset_cache.sync(storage, cache_dir, refresh=True)
+        load_history(storage, columns=TRAINING_COLUMNS)
+
+    return {
+        'sync_local_storage_cold': cold_sync,
+        'load_history_local_storage_warm': warm_load,
+        'load_history_training_columns_warm': warm_load_training
+    }
+
+
+def write_compact(bundle, directory):
+    """Write a bundle's compact export under directory; returns its manifest"""
+    for path, data in export_files(bundle).items():
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def model_stages(df, bundles, tmpdir):
+    """Model loading and inference stages for each model type and artifact format.
+
+    Returns (stages, {stage: artifact bytes}) for the load stages.
+    """
+    X_batch = build_features(df.copy())[FEATURE_COLUMNS].dropna()
+    X_row = X_batch.tail(1)
+    stages = {}
+    sizes = {}
+
+    for name, bundle in bundles.items():
+        path = save_bundle(bundle, os.path.join(tmpdir, f"bundle_{name}.joblib"))
+        compact_dir = os.path.join(tmpdir, f"compact_{name}")
+        manifest = write_compact(bundle, compact_dir)
+        artifacts = [(os.path.join(compact_dir, info['artifact']), info['format']) for info in manifest['horizons'].values()]
+
+        def load(path=path):
+            validate_bundle(joblib.load(path))
+
+        def load_compact(artifacts=artifacts):
+            return [load_artifact(path, fmt) for path, fmt in artifacts]
+
+        def predict_row(models=bundle['models']):
+            for model in models.values():
+                model.predict(X_row)
+
+        def predict_batch(models=bundle['models']):
+            for model in models.values():
+                model.predict(X_batch)
+
+        def predict_row_compact(models=load_compact()):
+            for model in models:
+                model.predict(X_row)
+
+        def predict_batch_compact(models=load_compact()):
+            for model in models:
+                model.predict(X_batch)
+
+        fmt = manifest['horizons']['day1']['format']
+        stages[f'model_load_{name}'] = load
+        stages[f'model_load_{fmt}_{name}'] = load_compact
+        stages[f'predict_single_row_{name}'] = predict_row
+        stages[f'predict_single_row_{fmt}_{name}'] = predict_row_compact
+        stages[f'predict_batch_{name}'] = predict_batch
+        stages[f'predict_batch_{fmt}_{name}'] = predict_batch_compact
+        sizes[f'model_load_{name}'] = os.path.getsize(path)
+        sizes[f'model_load_{fmt}_{name}'] = sum(os.path.getsize(p) for p, _ in artifacts)
+    return stages, sizes
+
+
+def run(sizes, repeats):
+    print(f"Training benchmark models on {TRAINING_ROWS} synthetic rows")
+    bundles = train_bundles()
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_rows in sizes:
+            start = time.perf_counter()
+            df = generate_history(n_rows)
+            print(f"\n{n_rows} rows (generated in {time.perf_counter() - start:.1f}s)")
+
+            stages = history_stages(df)
+            if n_rows <= MAX_STORAGE_ROWS:
+                stages.update(storage_stages(df, tmpdir))
+            model_fns, artifact_sizes = model_stages(df, bundles, tmpdir)
+            stages.update(model_fns)
+            for stage, fn in stages.items():
+                result = measure(fn, repeats)
+                result.update({'rows': n_rows, 'stage': stage})
+                size = ''
+                if stage in artifact_sizes:
+                    result['artifact_bytes'] = artifact_sizes[stage]
+                    size = f"  size {artifact_sizes[stage] / 1e6:8.2f} MB"
+                results.append(result)
+                print(f"  {stage:40s} {result['seconds_median'] * 1000:10.2f} ms  peak {result['peak_mb']:8.1f} MB{size}")
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results, path=None):
+    commit = git_commit()
+    path = path or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        'commit': commit,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nResults written to {path}")
+    return path
+
+
+def compare(baseline_path, results):
+    """Print the median-time ratio of each (rows, stage) against a saved baseline"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r['rows'], r['stage']): r['seconds_median'] for r in baseline['results']}
+
+    print(f"\nCompared with {baseline['commit']} (ratio > 1 is slower):")
+    for r in results:
+        key = (r['rows'], r['stage'])
+        if key in base and base[key] > 0:
+            print(f"  {r['rows']:>9} {r['stage']:40s} {r['seconds_median'] / base[key]:6.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark AQI pipeline stages on synthetic history")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="history lengths in hourly rows")
+    parser.add_argument("--repeats", type=int, default=5, help="timed repeats per stage")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON to compare against")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats)
+    save_results(results, args.output)
+    if args.compare:
+        compare(args.compare, results)
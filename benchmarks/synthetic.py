@@ -0,0 +1,34 @@
+"""Synthetic hourly AQI history in the schema written by hourly_predict.predict."""
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from aqi import aqi_to_pm25
+from dataset_store import normalize
+from features import build_features
+
+START_TIMESTAMP = 1672531200  # 2023-01-01 00:00 UTC
+
+
+def generate_history(n_rows, seed=42, start=START_TIMESTAMP):
+    """n_rows consecutive hours with daily/seasonal cycles, AR(1) noise and resolved targets"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_rows)
+
+    noise = lfilter([1.0], [1.0, -0.9], rng.normal(0, 8, n_rows))
+
+    daily = 20 * np.sin(2 * np.pi * (hours % 24) / 24)
+    seasonal = 40 * np.cos(2 * np.pi * hours / (24 * 365))
+    aqi = np.clip(np.round(110 + daily + seasonal + noise), 0, 500)
+    pm25 = np.round(aqi_to_pm25(aqi) + rng.normal(0, 1.5, n_rows), 1).clip(0)
+
+    df = pd.DataFrame({
+        'id': hours,
+        'timestamp': start + 3600 * hours,
+        'aqi': aqi.astype('int64'),
+        'pm2_5': pm25
+    })
+    df = build_features(df)
+    df['aqi_yesterday'] = df['aqi_yesterday'].fillna(df['aqi'])
+    df['aqi_change_24h'] = df['aqi'] - df['aqi_yesterday']
+    return normalize(df)
@@ -1,115 +1,190 @@
+import numpy as np
 import pandas as pd
-import joblib
 import json
-from huggingface_hub import login, HfApi
-from datasets import load_dataset
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import Ridge
-from sklearn.metrics import mean_absolute_error, r2_score
-import xgboost as xgb
-from datetime import datetime
 import os
-from dotenv import load_dotenv
+import argparse
+from sklearn.model_selection import train_test_split
+from datetime import datetime, timedelta
+from features import FEATURE_COLUMNS, TARGET_COLUMNS, build_features
+from dataset_store import load_history
+from model_bundle import BUNDLE_FILE, build_bundle, save_bundle, load_bundle
+from model_export import export_files
+from model_selection import run_sweep, best_result
+from incremental import WARM_START_MODELS, ridge_stats, update_model, validation_mae
+from storage import get_storage
 
-# Load environment variables
-load_dotenv()
-
-# Get HF_TOKEN from environment variable
-HF_TOKEN = os.getenv("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN environment variable not set. Create a .env file with HF_TOKEN=your_token")
-    
-REPO_ID = "Syed110-3/karachi-aqi-predictor"
-login(token=HF_TOKEN)
+FULL_RETRAIN_DAYS = 7
+# Fall back to a full retrain when MAE on newly labelled rows exceeds the
+# full-retrain test MAE by more than this fraction
+MAE_TOLERANCE = 0.25
+# Stored columns the features and targets are built from; the rest stay in Arrow
+TRAINING_COLUMNS = ['timestamp', 'location', 'hour', 'day_of_week', 'month',
+                    'aqi', 'aqi_yesterday', 'aqi_change_24h', 'pm2_5'] + TARGET_COLUMNS
 
 def prepare_data():
-    dataset = load_dataset(REPO_ID)
-    df = dataset['train'].to_pandas()
+    df = load_history(columns=TRAINING_COLUMNS)
     
-    for i in range(len(df)):
-        if i + 24 < len(df):
-            df.loc[i, 'target_day1'] = df.loc[i + 24, 'aqi']
-        
-        if i + 48 < len(df):
-            df.loc[i, 'target_day2'] = df.loc[i + 48, 'aqi']
-        
-        if i + 72 < len(df):
-            df.loc[i, 'target_day3'] = df.loc[i + 72, 'aqi']
+    df = build_features(df, overwrite_targets=True)
     
-    df = df.dropna(subset=['target_day1', 'target_day2', 'target_day3'])
+    df = df.dropna(subset=FEATURE_COLUMNS + TARGET_COLUMNS)
     
     print(f"Training on {len(df)} rows with complete targets")
     return df
 
-def train_models():
-    df = prepare_data()
+def full_retrain(df):
+    # One float64 block for every model; the split is shared by all horizons
+    X = pd.DataFrame(df[FEATURE_COLUMNS].to_numpy(dtype='float64'), columns=FEATURE_COLUMNS)
+    train, test = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    X_train, X_test = X.iloc[train], X.iloc[test]
     
-    X = df[['hour', 'day_of_week', 'month', 'aqi', 'aqi_yesterday', 'aqi_change_24h', 'pm2_5']]
+    best_models = {}
+    model_infos = {}
+    ridge_state = {}
     
-    api = HfApi()
+    splits = {}
+    for day_num in [1, 2, 3]:
+        y = df[f'target_day{day_num}'].to_numpy(dtype='float64')
+        splits[day_num] = (X_train, X_test, pd.Series(y[train]), pd.Series(y[test]))
+    
+    sweep = run_sweep(splits)
     
     for day_num in [1, 2, 3]:
-        target_col = f'target_day{day_num}'
-        y = df[target_col]
-        
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        models = {
-            'RandomForest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'Ridge': Ridge(alpha=1.0, random_state=42),
-            'XGBoost': xgb.XGBRegressor(n_estimators=100, random_state=42)
-        }
-        
-        best_model = None
-        best_name = ""
-        best_mae = float('inf')
-        
-        for name, model in models.items():
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            mae = mean_absolute_error(y_test, y_pred)
-            
-            if mae < best_mae:
-                best_mae = mae
-                best_r2 = r2_score(y_test, y_pred)
-                best_model = model
-                best_name = name
-        
-        model_filename = f'best_model_day{day_num}.pkl'
-        joblib.dump(best_model, model_filename)
-        
-        api.upload_file(
-            path_or_fileobj=model_filename,
-            path_in_repo=f"models/best_model_day{day_num}.pkl",
-            repo_id=REPO_ID,
-            repo_type="model"
-        )
+        best = best_result(sweep[day_num])
+        best_model = best['model']
+        best_name = best['name']
+        best_mae = best['mae']
+        best_r2 = best['r2']
         
         model_info = {
             'model_name': best_name,
             'mae': float(best_mae),
             'r2': float(best_r2),
-            'features': ['hour', 'day_of_week', 'month', 'aqi', 'aqi_yesterday', 'aqi_change_24h', 'pm2_5'],
+            'features': FEATURE_COLUMNS,
             'target': f'target_day{day_num}',
             'trained_at': datetime.now().isoformat(),
-            'training_samples': len(df)
+            'training_samples': len(df),
+            'training_mode': 'full',
+            'candidates': {
+                r['name']: {'mae': r['mae'], 'fit_seconds': round(r['fit_seconds'], 3)}
+                for r in sweep[day_num]
+            }
         }
         
-        info_filename = f'model_info_day{day_num}.json'
-        with open(info_filename, 'w') as f:
-            json.dump(model_info, f, indent=2)
+        X_train, _, y_train, _ = splits[day_num]
+        ridge_state[day_num] = ridge_stats(X_train, y_train)
         
-        api.upload_file(
-            path_or_fileobj=info_filename,
-            path_in_repo=f"models/model_info_day{day_num}.json",
-            repo_id=REPO_ID,
-            repo_type="model"
-        )
+        best_models[day_num] = best_model
+        model_infos[day_num] = model_info
         
         print(f"Day {day_num}: {best_name}, MAE={best_mae:.2f}")
     
-    print("All models updated in Hugging Face")
+    state = {
+        'trained_through': int(df['timestamp'].max()),
+        'last_full_retrain': datetime.now().isoformat(),
+        'ridge_stats': ridge_state
+    }
+    return build_bundle(best_models, model_infos, state=state)
+
+def incremental_update(df, bundle):
+    """Update the current bundle with rows labelled since it was trained.
+    
+    Returns None when a horizon's MAE on the new rows has regressed, so the
+    caller falls back to a full retrain.
+    """
+    state = bundle['state']
+    new_rows = df[df['timestamp'] > state['trained_through']]
+    models = {}
+    model_infos = {}
+    ridge_state = dict(state['ridge_stats'])
+    
+    for day_num in [1, 2, 3]:
+        info = dict(bundle['manifest']['horizons'][f'day{day_num}'])
+        X_new = new_rows[info['features']]
+        y_new = new_rows[f'target_day{day_num}']
+        
+        # Score the current model on rows it has never seen before training on them
+        mae = validation_mae(bundle['models'][day_num], X_new, y_new)
+        if mae > info['mae'] * (1 + MAE_TOLERANCE):
+            print(f"Day {day_num}: MAE on new rows {mae:.2f} regressed from {info['mae']:.2f}")
+            return None
+        
+        model, ridge_state[day_num] = update_model(
+            info['model_name'], bundle['models'][day_num], X_new, y_new, ridge_state.get(day_num)
+        )
+        
+        info.update({
+            'validation_mae': mae,
+            'trained_at': datetime.now().isoformat(),
+            'training_samples': info['training_samples'] + len(new_rows),
+            'training_mode': 'incremental'
+        })
+        models[day_num] = model
+        model_infos[day_num] = info
+        
+        action = f"updated with {len(new_rows)} rows" if info['model_name'] in WARM_START_MODELS else "kept until next full retrain"
+        print(f"Day {day_num}: {info['model_name']} {action}, MAE on new rows={mae:.2f}")
+    
+    state = dict(state, trained_through=int(new_rows['timestamp'].max()), ridge_stats=ridge_state)
+    return build_bundle(models, model_infos, state=state)
+
+def needs_full_retrain(bundle):
+    state = bundle.get('state') or {}
+    if 'trained_through' not in state or 'last_full_retrain' not in state:
+        return True
+    # Models trained before the feature set changed never see the new columns otherwise
+    if any(info['features'] != FEATURE_COLUMNS for info in bundle['manifest']['horizons'].values()):
+        return True
+    last_full = datetime.fromisoformat(state['last_full_retrain'])
+    return datetime.now() - last_full >= timedelta(days=FULL_RETRAIN_DAYS)
+
+def publish_bundle(bundle):
+    bundle_filename = save_bundle(bundle, 'model_bundle.joblib')
+    
+    for day_num, info in bundle['manifest']['horizons'].items():
+        with open(f'model_info_{day_num}.json', 'w') as f:
+            json.dump(info, f, indent=2)
+    
+    compact = export_files(bundle)
+    print(f"Artifacts: joblib bundle {os.path.getsize(bundle_filename) / 1e6:.2f} MB, "
+          f"compact export {sum(len(data) for data in compact.values()) / 1e6:.2f} MB")
+    
+    # Bundle, compact export and per-horizon metadata go up in one commit so they never disagree
+    files = {BUNDLE_FILE: bundle_filename}
+    files.update(compact)
+    files.update({
+        f"models/model_info_{day_num}.json": f'model_info_{day_num}.json'
+        for day_num in bundle['manifest']['horizons']
+    })
+    storage = get_storage()
+    storage.commit(files, "model", f"Model bundle {bundle['version']}")
+    
+    print(f"Model bundle {bundle['version']} published to {storage.name}")
+
+def train_models(full=False):
+    df = prepare_data()
+    
+    bundle = None
+    if not full:
+        try:
+            current = load_bundle()
+            if needs_full_retrain(current):
+                print(f"Full retrain due (every {FULL_RETRAIN_DAYS} days or after a feature set change)")
+            elif not (df['timestamp'] > current['state']['trained_through']).any():
+                print(f"No newly labelled rows since bundle {current['version']}, nothing to do")
+                return
+            else:
+                bundle = incremental_update(df, current)
+        except Exception as e:
+            print(f"Incremental update unavailable ({type(e).__name__}: {e})")
+    
+    if bundle is None:
+        print("Running full retrain")
+        bundle = full_retrain(df)
+    
+    publish_bundle(bundle)
 
 if __name__ == "__main__":
-    train_models()
+    parser = argparse.ArgumentParser(description="Train the day 1-3 AQI models")
+    parser.add_argument("--full", action="store_true", help="retrain every model from scratch")
+    args = parser.parse_args()
+    train_models(full=args.full)
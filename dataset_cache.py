@@ -0,0 +1,143 @@
+"""Local Parquet cache of the dataset shards, synced against the storage backend by revision.
+
+The cache directory mirrors the repo paths (data/daily/..., data/recent.parquet)
+next to a manifest.json recording the backend and revision it matches and a
+content key per shard. A sync costs one metadata request; only shards whose key
+changed since the last sync are downloaded, everything else is memory-mapped
+from disk.
+"""
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage import get_storage
+
+CACHE_DIR = os.getenv("AQI_CACHE_DIR", ".aqi_cache")
+MANIFEST_FILE = "manifest.json"
+SHARD_PREFIX = "data/"
+
+# Per-process state so repeated loads within one run skip the metadata round-trip
+_manifests = {}
+_tables = {}
+
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_FILE)
+
+
+def _empty_manifest(source):
+    return {'source': source, 'revision': None, 'files': {}}
+
+
+def _read_manifest(cache_dir, source):
+    try:
+        with open(_manifest_path(cache_dir)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return _empty_manifest(source)
+    # A cache filled from another backend cannot be trusted key-for-key
+    return manifest if manifest.get('source') == source else _empty_manifest(source)
+
+
+def _write_manifest(cache_dir, manifest):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(_manifest_path(cache_dir), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def sync(storage=None, cache_dir=None, refresh=False):
+    """Bring the cache up to the backend's current revision and return its manifest.
+
+    Runs at most once per process unless refresh=True. If the backend cannot be
+    reached the previously cached revision is used as-is.
+    """
+    storage = storage or get_storage()
+    cache_dir = cache_dir or CACHE_DIR
+    key = (storage.name, cache_dir)
+    if not refresh and key in _manifests:
+        return _manifests[key]
+
+    manifest = _read_manifest(cache_dir, storage.name)
+    try:
+        revision, remote = storage.snapshot("dataset", prefix=SHARD_PREFIX)
+    except Exception as e:
+        print(f"Dataset sync failed ({type(e).__name__}), using cached revision {manifest['revision']}")
+        _manifests[key] = manifest
+        return manifest
+
+    if revision != manifest['revision']:
+        remote = {path: k for path, k in remote.items() if path.endswith(".parquet")}
+
+        downloaded = 0
+        for path, content_key in remote.items():
+            if manifest['files'].get(path) != content_key or not os.path.exists(os.path.join(cache_dir, path)):
+                storage.download(path, "dataset", revision=revision, local_dir=cache_dir)
+                downloaded += 1
+
+        for path in set(manifest['files']) - set(remote):
+            local_path = os.path.join(cache_dir, path)
+            if os.path.exists(local_path):
+                os.remove(local_path)
+
+        manifest = {'source': storage.name, 'revision': revision, 'files': remote}
+        _write_manifest(cache_dir, manifest)
+        print(f"Synced dataset revision {str(revision)[:8]}: downloaded {downloaded} of {len(remote)} shards")
+
+    _manifests[key] = manifest
+    return manifest
+
+
+def cached_files(storage=None, cache_dir=None):
+    """Repo paths of all shards in the synced cache"""
+    return list(sync(storage, cache_dir)['files'])
+
+
+def _read_shard(path, columns=None):
+    shard = pq.ParquetFile(path, memory_map=True)
+    if columns is not None:
+        # Older shards may predate a column; normalizing fills it in later
+        columns = [col for col in columns if col in shard.schema_arrow.names]
+    return shard.read(columns=columns)
+
+
+def load_table(paths, storage=None, cache_dir=None, columns=None):
+    """Concatenate the given shards (in order) into one Arrow table, memory-mapped from the cache.
+
+    With `columns`, only those column chunks are read from each shard.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    manifest = sync(storage, cache_dir)
+    paths = [p for p in paths if p in manifest['files']]
+    key = (manifest['source'], cache_dir, manifest['revision'], tuple(paths), tuple(columns or ()))
+
+    if key not in _tables:
+        tables = [_read_shard(os.path.join(cache_dir, p), columns) for p in paths]
+        if not tables:
+            return None
+        _tables[key] = pa.concat_tables(tables, promote_options="default")
+    return _tables[key]
+
+
+def store(files, revision, storage=None, cache_dir=None):
+    """Write freshly committed shards ({path: bytes}) through to the cache at the new revision"""
+    storage = storage or get_storage()
+    cache_dir = cache_dir or CACHE_DIR
+    key = (storage.name, cache_dir)
+    manifest = _manifests.get(key) or _read_manifest(cache_dir, storage.name)
+    manifest = {'source': storage.name, 'revision': revision, 'files': dict(manifest['files'])}
+
+    for path, data in files.items():
+        local_path = os.path.join(cache_dir, path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        # Replace rather than overwrite so tables still mapping the old file stay valid
+        with open(local_path + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(local_path + ".tmp", local_path)
+        # Matches the Hub's LFS sha256; other backends just re-copy the file on the next revision change
+        manifest['files'][path] = hashlib.sha256(data).hexdigest()
+
+    _write_manifest(cache_dir, manifest)
+    _manifests[key] = manifest
@@ -0,0 +1,334 @@
+"""Append-only Parquet layout for the hourly AQI dataset on the Hugging Face Hub.
+
+    data/daily/YYYY/YYYY-MM-DD.parquet   one shard per complete day, written once
+    data/recent.parquet                  small mutable shard with rows whose day
+                                         still has targets being backfilled
+
+Each shard holds one row per location (see locations.py) per hour, ordered by
+timestamp then location.
+
+An hourly run only downloads and rewrites the recent shard (plus any day that
+just became complete), so the upload size does not grow with history. Reads go
+through the local shard cache in dataset_cache.py and writes through the
+configured storage backend (storage.py).
+"""
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import dataset_cache
+from aqi import pm25_to_aqi
+from features import HOUR, TARGET_COLUMNS, TARGET_HORIZONS, aqi_hours_away, fill_targets, to_datetime
+from locations import DEFAULT_LOCATION
+from storage import get_storage
+
+RECENT_SHARD = "data/recent.parquet"
+DAILY_SHARD_PREFIX = "data/daily/"
+DAY = 24 * HOUR
+# A target still missing this long after its row can no longer be filled in
+# (the location was dropped or the API has no reading for that hour)
+UNRESOLVABLE_AFTER = (max(TARGET_HORIZONS.values()) + 24) * HOUR
+
+COLUMN_DTYPES = {
+    'id': 'Int64',
+    'timestamp': 'Int64',
+    'location': 'string',
+    'aqi': 'Int64',
+    'pm2_5': 'float64',
+    'hour': 'Int64',
+    'day_of_week': 'Int64',
+    'month': 'Int64',
+    'year': 'Int64',
+    'aqi_yesterday': 'Int64',
+    'aqi_change_24h': 'Int64',
+    'target_day1': 'float64',
+    'target_day2': 'float64',
+    'target_day3': 'float64'
+}
+
+# The same schema in Arrow; to_frame maps it back to the pandas dtypes above
+ARROW_TYPES = {'Int64': pa.int64(), 'float64': pa.float64(), 'string': pa.string()}
+SCHEMA = pa.schema([(col, ARROW_TYPES[dtype]) for col, dtype in COLUMN_DTYPES.items()])
+PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.string(): pd.StringDtype()}
+
+
+def daily_shard_path(date):
+    return f"data/daily/{date[:4]}/{date}.parquet"
+
+
+def normalize(df):
+    """Cast to the shared shard schema (epoch-second timestamps, nullable ints) sorted by time and location"""
+    df = df.copy()
+    if not pd.api.types.is_numeric_dtype(df['timestamp']):
+        df['timestamp'] = to_datetime(df['timestamp']).dt.as_unit('s').astype('int64')
+    # Rows written before multi-location ingestion all come from the original point
+    df['location'] = df['location'].fillna(DEFAULT_LOCATION) if 'location' in df else DEFAULT_LOCATION
+    for col, dtype in COLUMN_DTYPES.items():
+        values = df[col] if col in df else pd.Series(None, index=df.index, dtype='float64')
+        if dtype == 'Int64' and values.dtype.kind == 'f':
+            values = values.round()
+        df[col] = values.astype(dtype)
+    return df[list(COLUMN_DTYPES)].sort_values(['timestamp', 'location'], kind='stable').reset_index(drop=True)
+
+
+def normalize_table(table, columns=None):
+    """Arrow counterpart of normalize: cast to SCHEMA (absent columns null), sorted by time and location.
+
+    With `columns` (which must include timestamp and location) only those
+    schema columns are kept. Columns already of the schema type pass through
+    without a copy, and shards, which are written sorted, are not re-sorted.
+    """
+    schema = SCHEMA if columns is None else pa.schema([SCHEMA.field(col) for col in columns])
+    if 'timestamp' in table.column_names and not pa.types.is_integer(table['timestamp'].type):
+        # ISO-string timestamps only come from the initial push_to_hub load
+        return pa.Table.from_pandas(normalize(table.to_pandas())[schema.names], schema=schema, preserve_index=False)
+
+    arrays = []
+    for field in schema:
+        if field.name not in table.column_names:
+            column = pa.nulls(len(table), field.type)
+        else:
+            column = table[field.name]
+            if field.type == pa.int64() and pa.types.is_floating(column.type):
+                column = pc.round(column)
+                column = pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column)
+            column = column.cast(field.type)
+        if field.name == 'location':
+            # Rows written before multi-location ingestion all come from the original point
+            column = pc.fill_null(column, DEFAULT_LOCATION)
+        arrays.append(column)
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    if len(table) > 1:
+        timestamps, locations = table['timestamp'], table['location']
+        later = pc.greater(timestamps[1:], timestamps[:-1])
+        tied = pc.and_(pc.equal(timestamps[1:], timestamps[:-1]), pc.greater_equal(locations[1:], locations[:-1]))
+        if not pc.all(pc.or_(later, tied)).as_py():
+            table = table.sort_by([('timestamp', 'ascending'), ('location', 'ascending')])
+    return table
+
+
+def to_table(rows):
+    """Normalized Arrow table from a frame or a table of rows"""
+    if isinstance(rows, pa.Table):
+        return normalize_table(rows)
+    return pa.Table.from_pandas(normalize(rows), schema=SCHEMA, preserve_index=False)
+
+
+def to_frame(table):
+    """Pandas frame with the normalize dtypes, converted column by column from an Arrow table"""
+    return table.to_pandas(types_mapper=PANDAS_TYPES.get)
+
+
+def split_sealed(table):
+    """Split a normalized table into complete, fully resolved days and the rows that stay in the recent shard.
+
+    A day is sealed once a later day has started and none of its rows are
+    waiting on a target. A row waits while a target is missing, until it is
+    UNRESOLVABLE_AFTER older than the newest row; after that the day is sealed
+    with the target left empty, so one silent location cannot hold back the
+    others. Rows are sorted by time, so the sealed days are a prefix and every
+    part is a zero-copy slice. Returns ({date: table}, recent_table).
+    """
+    if not len(table):
+        return {}, table
+
+    timestamps = table['timestamp'].to_numpy()
+    days = timestamps // DAY
+    unresolved = np.zeros(len(table), dtype=bool)
+    for col in TARGET_COLUMNS:
+        unresolved |= table[col].is_null(nan_is_null=True).to_numpy()
+    unresolved &= timestamps > timestamps[-1] - UNRESOLVABLE_AFTER
+    open_from = days[-1]
+    if unresolved.any():
+        open_from = min(open_from, days[unresolved].min())
+
+    end = int(np.searchsorted(days, open_from))
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(days[:end])) + 1]) if end else []
+    sealed = {
+        pd.Timestamp(int(days[start]) * DAY, unit='s').strftime('%Y-%m-%d'): table.slice(start, stop - start)
+        for start, stop in zip(starts, list(starts[1:]) + [end])
+    }
+    return sealed, table.slice(end)
+
+
+def table_bytes(table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def to_parquet_bytes(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def empty_frame():
+    return to_frame(SCHEMA.empty_table())
+
+
+def load_table(paths, storage=None, columns=None, where=None):
+    """Normalized Arrow table of the given shards, optionally filtered and projected.
+
+    Only `columns` (plus timestamp and location, which the sort order needs)
+    are read from the shards. `where` is a pyarrow.compute expression over
+    those columns, e.g. pc.field('timestamp') >= start.
+    """
+    read = None if columns is None else list(dict.fromkeys(['timestamp', 'location'] + list(columns)))
+    table = dataset_cache.load_table(paths, storage=storage, columns=read)
+    if table is None:
+        table = SCHEMA.empty_table()
+    table = normalize_table(table, read)
+    if where is not None:
+        table = table.filter(where)
+    return table.select(columns) if columns is not None else table
+
+
+def history_shards(storage=None):
+    """Every sealed daily shard in date order followed by the recent shard"""
+    files = dataset_cache.cached_files(storage=storage)
+    return sorted(f for f in files if f.startswith(DAILY_SHARD_PREFIX)) + [RECENT_SHARD]
+
+
+def load_recent(storage=None):
+    """Rows of the mutable recent shard (empty frame if the shard does not exist yet)"""
+    table = dataset_cache.load_table([RECENT_SHARD], storage=storage)
+    if table is None:
+        print("No recent shard found")
+        return empty_frame()
+    return to_frame(normalize_table(table))
+
+
+def load_history(storage=None, columns=None, where=None):
+    """Full history as a frame, filtered and projected in Arrow before conversion"""
+    return to_frame(load_table(history_shards(storage), storage, columns, where))
+
+
+def shard_files(rows):
+    """Parquet bytes for newly sealed days and the recent shard of a frame or table of rows"""
+    sealed, recent = split_sealed(to_table(rows))
+    files = {daily_shard_path(date): table_bytes(part) for date, part in sealed.items()}
+    files[RECENT_SHARD] = table_bytes(recent)
+    return files, list(sealed), len(recent)
+
+
+def save_recent(rows, storage=None, message="Hourly AQI update", extra_files=None):
+    """Seal complete days into their own shards and rewrite the recent shard in one commit.
+
+    `rows` is a frame or an Arrow table; `extra_files` ({path: bytes}) go up in
+    the same commit.
+    """
+    storage = storage or get_storage()
+    files, sealed_dates, _ = shard_files(rows)
+    revision = storage.commit({**files, **(extra_files or {})}, "dataset", message)
+    dataset_cache.store(files, revision, storage=storage)
+    return sealed_dates
+
+
+def merge_legacy(legacy, current):
+    """Legacy push_to_hub rows followed by rows hourly runs wrote to the shard layout before migrating.
+
+    Those runs started ids at 0 and had no lag history, so their ids continue
+    after the legacy rows and their lags and targets are looked up again
+    across both. A legacy row wins over a later row for the same hour.
+    """
+    legacy = normalize(legacy)
+    current = normalize(current)
+    current = current[~current.set_index(['location', 'timestamp']).index.isin(
+        legacy.set_index(['location', 'timestamp']).index
+    )].copy()
+    if current.empty:
+        return legacy
+
+    next_id = int(legacy['id'].max()) + 1 if len(legacy) else 0
+    current['id'] = np.arange(next_id, next_id + len(current))
+    df = normalize(pd.concat([legacy, current], ignore_index=True))
+
+    added = df['id'] >= next_id
+    yesterday = pd.Series(aqi_hours_away(df, -24), index=df.index)
+    df['aqi_yesterday'] = df['aqi_yesterday'].astype('float64').mask(added & yesterday.notna(), yesterday)
+    df['aqi_change_24h'] = df['aqi_change_24h'].astype('float64').mask(added, df['aqi'] - df['aqi_yesterday'])
+    df, _ = fill_targets(df)
+    return normalize(df)
+
+
+def migrate(storage=None):
+    """One-off conversion of the single push_to_hub table into the partitioned layout.
+
+    Rows hourly runs already wrote to the new layout are merged in rather than
+    overwritten.
+    """
+    storage = storage or get_storage()
+    old_files = [f for f in storage.list_files("dataset", prefix="data/train-") if f.endswith(".parquet")]
+    if not old_files:
+        print("Nothing to migrate")
+        return
+
+    df = pd.concat([pd.read_parquet(storage.download(f, "dataset")) for f in sorted(old_files)], ignore_index=True)
+    shards = [f for f in storage.list_files("dataset", prefix=DAILY_SHARD_PREFIX) if f.endswith(".parquet")]
+    shards += storage.list_files("dataset", prefix=RECENT_SHARD)
+    if shards:
+        current = pd.concat([pd.read_parquet(storage.download(f, "dataset")) for f in sorted(shards)], ignore_index=True)
+        print(f"Merging {len(current)} rows written to the shard layout before migrating")
+        df = merge_legacy(df, current)
+
+    files, sealed_dates, recent_rows = shard_files(df)
+    storage.commit(files, "dataset", "Split dataset into daily shards", delete=old_files)
+    print(f"Migrated {len(df)} rows into {len(sealed_dates)} daily shards and {recent_rows} recent rows")
+
+
+def recompute_aqi(df):
+    """Recompute AQI from PM2.5 for every row (all locations) in one pass, then its lags and targets.
+
+    Rows without a PM2.5 reading keep their AQI, and lags / targets whose
+    source row is not in the frame keep their stored value.
+    """
+    df = normalize(df)
+    pm25 = df['pm2_5'].to_numpy(dtype='float64', na_value=np.nan)
+    aqi = np.where(np.isnan(pm25), df['aqi'].to_numpy(dtype='float64', na_value=np.nan), pm25_to_aqi(pm25))
+    df['aqi'] = aqi
+
+    df['aqi_yesterday'] = pd.Series(aqi_hours_away(df, -24), index=df.index).fillna(df['aqi_yesterday'].astype('float64'))
+    df['aqi_change_24h'] = df['aqi'] - df['aqi_yesterday']
+    df, _ = fill_targets(df, overwrite=True)
+    return normalize(df)
+
+
+def recompute_history(storage=None):
+    """Rewrite every shard with AQI recomputed from PM2.5 under the current breakpoints.
+
+    The rolling feature state is rebuilt from the new values in the same commit.
+    """
+    from feature_store import STATE_FILE, build_store
+
+    storage = storage or get_storage()
+    history = load_history(storage)
+    if history.empty:
+        print("No history to recompute")
+        return 0
+
+    before = history['aqi'].copy()
+    history = recompute_aqi(history)
+    changed = int((history['aqi'] != before).fillna(True).sum())
+    files, sealed_dates, _ = shard_files(history)
+    state = {STATE_FILE: build_store(history).to_json()}
+    revision = storage.commit({**files, **state}, "dataset", "Recompute AQI from PM2.5 breakpoints")
+    dataset_cache.store(files, revision, storage=storage)
+    print(f"Recomputed AQI for {len(history)} rows across {len(sealed_dates)} daily shards ({changed} changed)")
+    print("Rebuild the rollups (python rollups.py rebuild) and retrain so both use the new values")
+    return changed
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrate()
+    elif sys.argv[1:] == ["recompute-aqi"]:
+        recompute_history()
+    else:
+        print("Usage: python dataset_store.py migrate | recompute-aqi")
@@ -0,0 +1,191 @@
+"""Ring buffers of each location's last week of readings for the rolling features.
+
+Every location keeps WINDOW_HOURS slots indexed by epoch hour, plus per window
+a running integer sum and count (AQI and PM2.5 in tenths of a µg/m³) and a
+monotonic deque for the maximum. Pushing a reading therefore updates every
+rolling aggregate in O(1), amortised; an hour with no reading costs one
+eviction step. The values equal features.rolling_features over the full
+history, which is what training uses.
+
+The buffers are saved to features/rolling_state.json in the dataset repo in the
+same commit as the recent shard. A location whose saved state does not end at
+its newest stored row is rebuilt from the last week of history.
+"""
+import json
+import math
+from collections import deque
+
+import pandas as pd
+import pyarrow.compute as pc
+
+from dataset_store import load_history
+from features import HOUR, ROLLING_WINDOWS, TREND_WINDOWS, pm25_tenths
+from storage import get_storage
+
+STATE_FILE = "features/rolling_state.json"
+WINDOW_HOURS = max(ROLLING_WINDOWS.values())
+
+
+class LocationBuffer:
+    def __init__(self):
+        self.hour = None
+        self.stamps = [None] * WINDOW_HOURS
+        self.aqi = [None] * WINDOW_HOURS
+        self.pm25 = [None] * WINDOW_HOURS
+        self.sums = {n: [0, 0, 0, 0] for n in ROLLING_WINDOWS.values()}  # aqi sum, aqi count, pm sum, pm count
+        self.maxima = {n: deque() for n in ROLLING_WINDOWS.values()}     # (hour, aqi) with decreasing aqi
+
+    def rows(self):
+        """(hour, aqi, pm25 tenths) still in the buffer, oldest first"""
+        return sorted(
+            (hour, self.aqi[i], self.pm25[i]) for i, hour in enumerate(self.stamps) if hour is not None
+        )
+
+    def _advance(self, hour):
+        """Drop, from every window, the hour that falls out of it when `hour` starts"""
+        for n, sums in self.sums.items():
+            old = hour - n
+            slot = old % WINDOW_HOURS
+            if self.stamps[slot] == old:
+                if self.aqi[slot] is not None:
+                    sums[0] -= self.aqi[slot]
+                    sums[1] -= 1
+                if self.pm25[slot] is not None:
+                    sums[2] -= self.pm25[slot]
+                    sums[3] -= 1
+            maxima = self.maxima[n]
+            while maxima and maxima[0][0] <= old:
+                maxima.popleft()
+        # The slot's previous hour has just left the widest window
+        self.stamps[hour % WINDOW_HOURS] = None
+
+    def push(self, hour, aqi, pm25):
+        """Add the reading for epoch hour `hour` (aqi as int, pm25 in tenths; either may be None)"""
+        if self.hour is not None and hour <= self.hour:
+            # A second reading for the newest hour replaces it; anything older is out of order
+            if hour < self.hour:
+                raise ValueError(f"Reading for hour {hour} is older than the buffer's newest hour {self.hour}")
+            rows = self.rows()[:-1]
+            self.__init__()
+            for row in rows:
+                self.push(*row)
+
+        if self.hour is None or hour - self.hour >= WINDOW_HOURS:
+            self.__init__()
+        else:
+            for step in range(self.hour + 1, hour + 1):
+                self._advance(step)
+
+        slot = hour % WINDOW_HOURS
+        self.stamps[slot], self.aqi[slot], self.pm25[slot] = hour, aqi, pm25
+        self.hour = hour
+        for n, sums in self.sums.items():
+            if aqi is not None:
+                sums[0] += aqi
+                sums[1] += 1
+                maxima = self.maxima[n]
+                while maxima and maxima[-1][1] <= aqi:
+                    maxima.pop()
+                maxima.append((hour, aqi))
+            if pm25 is not None:
+                sums[2] += pm25
+                sums[3] += 1
+
+    def features(self):
+        """Rolling columns at the newest hour"""
+        current_pm25 = self.pm25[self.hour % WINDOW_HOURS]
+        row = {}
+        for name, n in ROLLING_WINDOWS.items():
+            aqi_sum, aqi_count, _, _ = self.sums[n]
+            row[f'aqi_mean_{name}'] = aqi_sum / aqi_count if aqi_count else math.nan
+            row[f'aqi_max_{name}'] = float(self.maxima[n][0][1]) if self.maxima[n] else math.nan
+        for name in TREND_WINDOWS:
+            _, _, pm_sum, pm_count = self.sums[ROLLING_WINDOWS[name]]
+            row[f'pm2_5_trend_{name}'] = (current_pm25 - pm_sum / pm_count) / 10 if current_pm25 is not None else math.nan
+        return row
+
+
+def reading(aqi, pm25):
+    """(aqi, pm25 tenths) as buffer values, None where missing"""
+    aqi = None if pd.isna(aqi) else int(aqi)
+    pm25 = None if pd.isna(pm25) else int(pm25_tenths(pm25))
+    return aqi, pm25
+
+
+class RollingStore:
+    def __init__(self):
+        self.buffers = {}
+
+    def push(self, location, timestamp, aqi, pm25):
+        """Add one reading (epoch-second timestamp) and return its rolling columns"""
+        buffer = self.buffers.setdefault(location, LocationBuffer())
+        buffer.push(int(timestamp) // HOUR, *reading(aqi, pm25))
+        return buffer.features()
+
+    def push_frame(self, df):
+        """Push the rows of a frame (location, timestamp, aqi, pm2_5) in time order"""
+        for row in df.sort_values(['timestamp', 'location'], kind='stable').itertuples(index=False):
+            self.push(row.location, row.timestamp, row.aqi, row.pm2_5)
+
+    def newest_hour(self, location):
+        buffer = self.buffers.get(location)
+        return buffer.hour if buffer else None
+
+    def to_json(self):
+        return json.dumps({
+            location: [list(row) for row in buffer.rows()] for location, buffer in self.buffers.items()
+        }).encode()
+
+    @classmethod
+    def from_json(cls, data):
+        store = cls()
+        for location, rows in json.loads(data).items():
+            buffer = store.buffers.setdefault(location, LocationBuffer())
+            for hour, aqi, pm25 in rows:
+                buffer.push(hour, aqi, pm25)
+        return store
+
+
+def build_store(history):
+    """Rolling state built from the last WINDOW_HOURS of each location's rows in a history frame"""
+    store = RollingStore()
+    if history.empty:
+        return store
+    newest = history.groupby('location')['timestamp'].transform('max') // HOUR
+    rows = history[history['timestamp'] // HOUR > newest - WINDOW_HOURS]
+    store.push_frame(rows[['location', 'timestamp', 'aqi', 'pm2_5']])
+    return store
+
+
+def load_store(df, storage=None, history=None):
+    """Saved rolling state, checked against the newest stored row of each location in `df`.
+
+    Locations whose state is missing or behind are rebuilt from the last
+    WINDOW_HOURS of history (`history` frame, else just those rows read from
+    the stored history).
+    """
+    storage = storage or get_storage()
+    try:
+        store = RollingStore.from_json(storage.read_bytes(STATE_FILE, "dataset"))
+    except FileNotFoundError:
+        store = RollingStore()
+    except Exception as e:
+        print(f"Could not read the rolling feature state ({type(e).__name__}: {e}), rebuilding it")
+        store = RollingStore()
+
+    if df.empty:
+        return store
+    newest = (df.groupby('location')['timestamp'].max() // HOUR).astype('int64')
+    stale = [location for location, hour in newest.items() if store.newest_hour(location) != hour]
+    if stale:
+        if history is None:
+            since = (int(newest[stale].min()) - WINDOW_HOURS + 1) * HOUR
+            history = load_history(storage, columns=['location', 'timestamp', 'aqi', 'pm2_5'],
+                                   where=pc.field('location').isin(stale) & (pc.field('timestamp') >= since))
+        rows = history[history['location'].isin(stale)]
+        rows = rows[rows['timestamp'] // HOUR > rows['location'].map(newest) - WINDOW_HOURS]
+        for location in stale:
+            store.buffers.pop(location, None)
+        store.push_frame(rows[['location', 'timestamp', 'aqi', 'pm2_5']])
+        print(f"Rebuilt rolling features for {len(stale)} locations from history")
+    return store
@@ -0,0 +1,225 @@
+import numpy as np
+import pandas as pd
+
+HOUR = 3600
+# Rolling windows (hours) over each location's readings, ending at and including the current hour
+ROLLING_WINDOWS = {'3h': 3, '6h': 6, '24h': 24, '7d': 168}
+TREND_WINDOWS = ['3h', '24h']
+ROLLING_COLUMNS = (
+    [f'aqi_mean_{name}' for name in ROLLING_WINDOWS]
+    + [f'aqi_max_{name}' for name in ROLLING_WINDOWS]
+    + [f'pm2_5_trend_{name}' for name in TREND_WINDOWS]
+)
+
+FEATURE_COLUMNS = ['hour', 'day_of_week', 'month', 'aqi', 'aqi_yesterday', 'aqi_change_24h', 'pm2_5'] + ROLLING_COLUMNS
+
+# Forecast horizon (days ahead) -> hours to look ahead
+TARGET_HORIZONS = {1: 24, 2: 48, 3: 72}
+TARGET_COLUMNS = [f'target_day{day}' for day in TARGET_HORIZONS]
+
+
+def to_datetime(values):
+    """Parse dataset timestamps (epoch seconds from hourly runs or ISO strings from the initial load)"""
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values, unit='s')
+    return pd.to_datetime(values)
+
+
+def epoch_hours(values):
+    """Epoch hour of each timestamp (epoch seconds or ISO strings)"""
+    return to_datetime(pd.Series(values)).dt.as_unit('s').astype('int64').to_numpy() // HOUR
+
+
+def locations_of(df):
+    """Each row's location ('' for frames without a location column)"""
+    if 'location' not in df:
+        return np.full(len(df), '', dtype=object)
+    return df['location'].to_numpy(dtype=object)
+
+
+def lookup_aqi(df, locations, timestamps):
+    """Stored AQI for each (location, timestamp) pair, NaN where that hour is missing"""
+    stored = pd.Series(
+        df['aqi'].to_numpy(dtype='float64', na_value=np.nan),
+        index=pd.MultiIndex.from_arrays([locations_of(df), epoch_hours(df['timestamp'])])
+    )
+    stored = stored[~stored.index.duplicated(keep='last')]
+    keys = pd.MultiIndex.from_arrays([np.asarray(locations, dtype=object), epoch_hours(timestamps)])
+    return stored.reindex(keys).to_numpy()
+
+
+def aqi_hours_away(df, hours, start=0):
+    """AQI of the same location `hours` later (earlier if negative) for rows from position `start`.
+
+    Looked up by timestamp, so gaps in a location's series give NaN rather
+    than a neighbouring hour's value. The frame is sorted by timestamp, so
+    later hours are searched in the rows from `start` onwards only.
+    """
+    rows = df.iloc[start:]
+    timestamps = epoch_hours(rows['timestamp']) * HOUR + hours * HOUR
+    return lookup_aqi(rows if hours > 0 else df, locations_of(rows), timestamps)
+
+
+def add_time_features(df):
+    """Fill hour/day_of_week/month/year from the timestamp column where missing"""
+    if 'timestamp' not in df:
+        return df
+
+    dt = to_datetime(df['timestamp'])
+    derived = {
+        'hour': dt.dt.hour,
+        'day_of_week': dt.dt.dayofweek,
+        'month': dt.dt.month,
+        'year': dt.dt.year
+    }
+    for col, values in derived.items():
+        df[col] = df[col].fillna(values) if col in df else values
+
+    return df
+
+
+def add_lag_features(df):
+    """Fill aqi_yesterday and aqi_change_24h from the same location's row 24 hours earlier where missing"""
+    aqi_yesterday = pd.Series(aqi_hours_away(df, -24), index=df.index)
+    if 'aqi_yesterday' in df:
+        df['aqi_yesterday'] = df['aqi_yesterday'].fillna(aqi_yesterday)
+    else:
+        df['aqi_yesterday'] = aqi_yesterday
+
+    aqi_change = df['aqi'] - df['aqi_yesterday']
+    if 'aqi_change_24h' in df:
+        df['aqi_change_24h'] = df['aqi_change_24h'].fillna(aqi_change)
+    else:
+        df['aqi_change_24h'] = aqi_change
+
+    return df
+
+
+def pm25_tenths(pm25):
+    """PM2.5 in integer tenths of a µg/m³ (as float, NaN kept), so window sums are exact"""
+    return np.round(np.asarray(pm25, dtype='float64') * 10)
+
+
+def rolling_features(hours, aqi, pm25):
+    """Rolling AQI means / maxima and PM2.5 trends for one location's readings.
+
+    `hours` are epoch hours; a window of n hours covers (hour - n, hour]. Sums
+    run over integers on an hourly grid, so the values match the ring buffers in
+    feature_store.py bit for bit. Returns {column: array} aligned with the input.
+    """
+    hours = np.asarray(hours, dtype='int64')
+    pos = hours - hours.min()
+    span = int(pos.max()) + 1
+
+    def grid(values):
+        values = np.asarray(values, dtype='float64')
+        present = ~np.isnan(values)
+        sums = np.zeros(span, dtype='int64')
+        counts = np.zeros(span, dtype='int64')
+        sums[pos[present]] = values[present]
+        counts[pos[present]] = 1
+        return sums, counts, np.concatenate([[0], np.cumsum(sums)]), np.concatenate([[0], np.cumsum(counts)])
+
+    def window(cumulative, n):
+        return cumulative[pos + 1] - cumulative[np.maximum(pos + 1 - n, 0)]
+
+    aqi_sums, aqi_counts, aqi_csum, aqi_ccount = grid(aqi)
+    tenths = pm25_tenths(pm25)
+    _, _, pm_csum, pm_ccount = grid(tenths)
+    aqi_grid = pd.Series(np.where(aqi_counts > 0, aqi_sums, np.nan))
+
+    columns = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for name, n in ROLLING_WINDOWS.items():
+            columns[f'aqi_mean_{name}'] = window(aqi_csum, n) / window(aqi_ccount, n)
+            columns[f'aqi_max_{name}'] = aqi_grid.rolling(n, min_periods=1).max().to_numpy()[pos]
+        for name in TREND_WINDOWS:
+            n = ROLLING_WINDOWS[name]
+            columns[f'pm2_5_trend_{name}'] = (tenths - window(pm_csum, n) / window(pm_ccount, n)) / 10
+    return columns
+
+
+def add_rolling_features(df):
+    """(Re)compute the rolling columns from each location's AQI and PM2.5 history"""
+    for col in ROLLING_COLUMNS:
+        df[col] = np.nan
+    if df.empty:
+        return df
+
+    hours = to_datetime(df['timestamp']).dt.as_unit('s').astype('int64').to_numpy() // HOUR
+    groups = df.groupby('location', sort=False).indices if 'location' in df else {None: np.arange(len(df))}
+    aqi = df['aqi'].to_numpy(dtype='float64', na_value=np.nan)
+    pm25 = df['pm2_5'].to_numpy(dtype='float64', na_value=np.nan)
+    for rows in groups.values():
+        for col, values in rolling_features(hours[rows], aqi[rows], pm25[rows]).items():
+            df.iloc[rows, df.columns.get_loc(col)] = values
+    return df
+
+
+def fill_targets(df, overwrite=False, start=0):
+    """Set target_day1/2/3 to the same location's AQI 24/48/72 hours later, one lookup per horizon.
+
+    Only rows from position `start` onwards are read and touched, so callers
+    that know everything before a watermark is already resolved pay for the
+    trailing window only. With overwrite=False only missing targets are filled. Returns
+    the frame and the number of target values that went from missing to known.
+    """
+    updated = 0
+
+    for day, offset in TARGET_HORIZONS.items():
+        col = f'target_day{day}'
+        if col not in df:
+            df[col] = np.nan
+        elif df[col].dtype != 'float64':
+            df[col] = df[col].astype('float64')
+
+        current = df[col].iloc[start:]
+        future = pd.Series(aqi_hours_away(df, offset, start), index=current.index)
+
+        filled = future.combine_first(current) if overwrite else current.fillna(future)
+        updated += int((current.isna() & filled.notna()).sum())
+        df.iloc[start:, df.columns.get_loc(col)] = filled.to_numpy()
+
+    return df, updated
+
+
+def first_unresolved(df, start=0):
+    """Position of the first row at or after `start` with any missing target (len(df) if none)"""
+    pending = df[TARGET_COLUMNS].iloc[start:].isna().any(axis=1).to_numpy()
+    if pending.any():
+        return start + int(pending.argmax())
+    return len(df)
+
+
+def build_features(df, overwrite_targets=False):
+    """Derive time features, lag features and forward targets for a history frame"""
+    df = df.reset_index(drop=True)
+    df = add_time_features(df)
+    df = add_lag_features(df)
+    df = add_rolling_features(df)
+    df, _ = fill_targets(df, overwrite=overwrite_targets)
+    return df
+
+
+def build_feature_row(aqi, timestamp, pm25, aqi_yesterday=None, location=None, rolling=None):
+    """Build the feature dict for a single live reading; `rolling` holds its rolling columns"""
+    dt = pd.to_datetime(timestamp)
+    if aqi_yesterday is None:
+        aqi_yesterday = aqi
+
+    row = {
+        'timestamp': dt.isoformat(),
+        'aqi': int(aqi),
+        'pm2_5': float(pm25),
+        'hour': int(dt.hour),
+        'day_of_week': int(dt.weekday()),
+        'month': int(dt.month),
+        'year': int(dt.year),
+        'aqi_yesterday': int(aqi_yesterday),
+        'aqi_change_24h': int(aqi - aqi_yesterday)
+    }
+    if rolling is not None:
+        row.update(rolling)
+    if location is not None:
+        row['location'] = location
+    return row
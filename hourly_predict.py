@@ -1,148 +1,143 @@
-import requests
+import argparse
 import pandas as pd
 import joblib
-import json
-from datetime import datetime, timedelta
-from huggingface_hub import login, HfApi, hf_hub_download
-from datasets import load_dataset, Dataset
-import os
-from dotenv import load_dotenv
+from datetime import datetime
 import numpy as np
+import pyarrow.compute as pc
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aqi import pm25_to_aqi
+from features import FEATURE_COLUMNS, HOUR, TARGET_COLUMNS, TARGET_HORIZONS, add_time_features, build_feature_row, build_features, fill_targets, lookup_aqi
+from dataset_store import load_recent, load_history, save_recent, to_parquet_bytes
+from feature_store import STATE_FILE, WINDOW_HOURS, load_store
+from model_bundle import load_bundle
+from model_export import load_compact
+from prediction_index import manifest_files, read_index
+import rollups
+from storage import get_storage
+from locations import DEFAULT_LOCATION, active_locations
+import http_client
 
-# Load environment variables
-load_dotenv()
+AIR_QUALITY_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+DAY = 24 * HOUR
+# Open-Meteo keeps roughly three months of past air quality data
+MAX_CATCHUP_HOURS = 90 * 24
 
-# Get HF_TOKEN from environment variable
-HF_TOKEN = os.getenv("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN not found. Create .env file with HF_TOKEN=your_token")
-
-REPO_ID = "Syed110-3/karachi-aqi-predictor"
-login(token=HF_TOKEN)
-
-def get_current_aqi():
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
-    params = {"latitude": 24.8607, "longitude": 67.0011, "current": "pm2_5"}
+def get_current_readings(locations=None):
+    """Fetch the current PM2.5 for every location in one batched Open-Meteo request.
     
-    try:
-        data = requests.get(url, params=params, timeout=5).json()
-        pm25 = data['current']['pm2_5']
-        timestamp = data['current']['time']
-        aqi = round((pm25 / 35.4) * 100)
-        return max(0, min(500, aqi)), timestamp, pm25
-    except:
-        return 100, datetime.now().isoformat(), 35.4
-
-def get_yesterday_aqi():
-    try:
-        dataset = load_dataset(REPO_ID)
-        df = dataset['train'].to_pandas()
-        if len(df) >= 24:
-            return df['aqi'].iloc[-24]
-        return None
-    except:
-        return None
-
-def create_features():
-    current_aqi, current_time, pm25 = get_current_aqi()
-    dt = pd.to_datetime(current_time)
-    
-    yesterday_aqi = get_yesterday_aqi() or current_aqi
-    
-    features = {
-        'timestamp': dt.isoformat(),
-        'aqi': int(current_aqi),  # Convert to int
-        'pm2_5': float(pm25),     # Convert to float
-        'hour': int(dt.hour),
-        'day_of_week': int(dt.weekday()),
-        'month': int(dt.month),
-        'year': int(dt.year),
-        'aqi_yesterday': int(yesterday_aqi),
-        'aqi_change_24h': int(current_aqi - yesterday_aqi)
+    Returns {location: (aqi, timestamp, pm25)}. Locations the API has no reading
+    for are skipped, and a failed request returns no readings: the hour is
+    skipped and the next run's catch-up request fills it in.
+    """
+    locations = locations or active_locations()
+    names = list(locations)
+    params = {
+        "latitude": ",".join(str(locations[name][0]) for name in names),
+        "longitude": ",".join(str(locations[name][1]) for name in names),
+        "current": "pm2_5"
     }
     
-    return features
-
-def load_model(day_num):
     try:
-        model_path = hf_hub_download(
-            repo_id=REPO_ID,
-            filename=f"models/best_model_day{day_num}.pkl",
-            token=HF_TOKEN
-        )
-        return joblib.load(model_path)
-    except:
-        return None
+        data = http_client.get_json(AIR_QUALITY_URL, params=params, timeout=5)
+    except Exception as e:
+        print(f"Open-Meteo fetch failed after retries ({type(e).__name__}: {e})")
+        return {}
+    
+    # One coordinate comes back as a single object, several as a list in request order
+    results = data if isinstance(data, list) else [data]
+    readings = {}
+    for name, result in zip(names, results):
+        current = result.get('current') or {}
+        pm25 = current.get('pm2_5')
+        if pm25 is None:
+            print(f"No PM2.5 reading for {name}, skipping")
+            continue
+        readings[name] = (int(pm25_to_aqi(pm25)), current['time'], pm25)
+    return readings
 
-def fill_target_values(df):
-    """Fill target_day1, target_day2, target_day3 using forward-looking logic"""
-    updated = 0
-    total_rows = len(df)
-    
-    # Only check rows that have null values in target columns
-    for idx, row in df.iterrows():
-        # Check if target_day1 is null
-        if pd.isna(row.get('target_day1')):
-            future_idx = idx + 24
-            if future_idx < total_rows and not pd.isna(df.at[future_idx, 'aqi']):
-                df.at[idx, 'target_day1'] = float(df.at[future_idx, 'aqi'])
-                updated += 1
-        
-        # Check if target_day2 is null
-        if pd.isna(row.get('target_day2')):
-            future_idx = idx + 48
-            if future_idx < total_rows and not pd.isna(df.at[future_idx, 'aqi']):
-                df.at[idx, 'target_day2'] = float(df.at[future_idx, 'aqi'])
-                updated += 1
-        
-        # Check if target_day3 is null
-        if pd.isna(row.get('target_day3')):
-            future_idx = idx + 72
-            if future_idx < total_rows and not pd.isna(df.at[future_idx, 'aqi']):
-                df.at[idx, 'target_day3'] = float(df.at[future_idx, 'aqi'])
-                updated += 1
+def epoch_hour(timestamp):
+    return int(pd.Timestamp(timestamp).floor('h').timestamp())
+
+def feature_rows(readings, df, store):
+    """Feature dicts for {location: (aqi, timestamp, pm25)} readings.
     
-    return df, updated
+    Lags are looked up by timestamp; each reading is pushed into the rolling
+    feature store, which returns its rolling columns.
+    """
+    names = list(readings)
+    yesterday = lookup_aqi(df, names, [epoch_hour(readings[name][1]) - DAY for name in names])
+    return [
+        build_feature_row(
+            aqi, timestamp, pm25, aqi if np.isnan(lag) else int(lag), location=name,
+            rolling=store.push(name, epoch_hour(timestamp), aqi, pm25)
+        )
+        for (name, (aqi, timestamp, pm25)), lag in zip(readings.items(), yesterday)
+    ]
 
-def predict():
-    features = create_features()
-    current_aqi = features['aqi']
-    
-    # Prepare input for model
-    input_df = pd.DataFrame([{
-        'hour': features['hour'],
-        'day_of_week': features['day_of_week'],
-        'month': features['month'],
-        'aqi': features['aqi'],
-        'aqi_yesterday': features['aqi_yesterday'],
-        'aqi_change_24h': features['aqi_change_24h'],
-        'pm2_5': features['pm2_5']
-    }])
+def get_missing_readings(df, current_time, locations):
+    """Fetch every hour between each location's newest stored row and the current hour.
     
-    predictions = {}
-    for day in [1, 2, 3]:
-        model = load_model(day)
-        if model:
-            pred = model.predict(input_df)[0]
-            predictions[f'day{day}'] = float(pred)
-        else:
-            predictions[f'day{day}'] = float(features['aqi'])
+    All locations and hours go in one ranged `hourly` Open-Meteo request.
+    Returns a frame of (timestamp, location, pm2_5, aqi) rows, empty when no
+    hour is missing, or None when the request fails. Locations without stored
+    history are not backfilled.
+    """
+    columns = ['timestamp', 'location', 'pm2_5', 'aqi']
+    last = df.groupby('location')['timestamp'].max()
+    last = last[last.index.isin(list(locations))]
+    if last.empty:
+        return pd.DataFrame(columns=columns)
     
-    # Load dataset
-    dataset = load_dataset(REPO_ID)
-    df = dataset['train'].to_pandas()
+    current_hour = epoch_hour(current_time)
+    start = max(int(last.min()) + HOUR, current_hour - MAX_CATCHUP_HOURS * HOUR)
+    end = current_hour - HOUR
+    if start > end:
+        return pd.DataFrame(columns=columns)
     
-    # Fill target values for all rows with null values
-    df, updated_count = fill_target_values(df)
+    names = list(last.index)
+    params = {
+        "latitude": ",".join(str(locations[name][0]) for name in names),
+        "longitude": ",".join(str(locations[name][1]) for name in names),
+        "hourly": "pm2_5",
+        "start_hour": pd.Timestamp(start, unit='s').strftime('%Y-%m-%dT%H:%M'),
+        "end_hour": pd.Timestamp(end, unit='s').strftime('%Y-%m-%dT%H:%M')
+    }
+    try:
+        data = http_client.get_json(AIR_QUALITY_URL, params=params, timeout=30)
+    except Exception as e:
+        print(f"Catch-up fetch for {(end - start) // HOUR + 1} missed hours failed ({type(e).__name__}: {e})")
+        return None
     
-    # Convert timestamp to integer for consistent storage
-    dt = pd.to_datetime(features['timestamp'])
-    timestamp_int = int(dt.timestamp())
+    frames = []
+    for name, result in zip(names, data if isinstance(data, list) else [data]):
+        hourly = result.get('hourly') or {}
+        part = pd.DataFrame({'timestamp': hourly.get('time', []), 'pm2_5': hourly.get('pm2_5', [])})
+        part['timestamp'] = pd.to_datetime(part['timestamp']).dt.as_unit('s').astype('int64')
+        part['location'] = name
+        frames.append(part[part['timestamp'] > last[name]])
     
-    # Create new row
-    new_row = {
-        'id': int(len(df)),
-        'timestamp': int(timestamp_int),
+    missing = pd.concat(frames, ignore_index=True).dropna(subset=['pm2_5'])
+    missing['aqi'] = pm25_to_aqi(missing['pm2_5']).astype('int64')
+    return missing[columns]
+
+def catch_up_rows(missing, df):
+    """Dataset rows for caught-up hours, with time features and lags derived in bulk"""
+    missing = add_time_features(missing.sort_values(['timestamp', 'location'], kind='stable').reset_index(drop=True))
+    history = pd.concat([df[['location', 'timestamp', 'aqi']], missing[['location', 'timestamp', 'aqi']]])
+    yesterday = lookup_aqi(history, missing['location'], missing['timestamp'] - DAY)
+    missing['aqi_yesterday'] = np.where(np.isnan(yesterday), missing['aqi'], yesterday).astype('int64')
+    missing['aqi_change_24h'] = missing['aqi'] - missing['aqi_yesterday']
+    for col in TARGET_COLUMNS:
+        missing[col] = np.nan
+    return missing
+
+def dataset_row(row_id, features):
+    """Dataset row for one location's live reading; targets are filled in by later runs"""
+    return {
+        'id': int(row_id),
+        'timestamp': int(pd.to_datetime(features['timestamp']).timestamp()),
+        'location': features['location'],
         'aqi': int(features['aqi']),
         'pm2_5': float(features['pm2_5']),
         'hour': int(features['hour']),
@@ -155,37 +150,222 @@ def predict():
         'target_day2': None,
         'target_day3': None
     }
+
+def load_model(day_num):
+    """Legacy per-horizon pickle, used until the first model bundle is published"""
+    try:
+        model_path = get_storage().download(f"models/best_model_day{day_num}.pkl", "model")
+        return joblib.load(model_path)
+    except Exception as e:
+        print(f"Could not load day {day_num} model: {type(e).__name__}: {e}")
+        return None
+
+def load_models():
+    """Return (version, {day: model}) from the compact export, else the joblib bundle, else per-day pickles"""
+    try:
+        return load_compact()
+    except Exception as e:
+        print(f"Compact models unavailable ({type(e).__name__}: {e}), loading the model bundle")
+    try:
+        bundle = load_bundle()
+        return bundle['version'], bundle['models']
+    except Exception as e:
+        print(f"Model bundle unavailable ({type(e).__name__}: {e}), falling back to per-day models")
+        return "legacy", {day: load_model(day) for day in [1, 2, 3]}
+
+def fill_target_values(df):
+    """Fill target_day1, target_day2, target_day3 from the AQI 24/48/72 hours later.
+
+    df is the recent shard, so the scan covers a few days of rows. Returns the
+    frame and the number of targets filled.
+    """
+    return fill_targets(df)
+
+def run_models(models, X):
+    """Predict every horizon for a frame of feature rows in one call per model.
     
-    # Add new row
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+    Each model gets the feature columns it was trained on; horizons without a
+    model fall back to the current AQI.
+    """
+    predictions = {}
+    for day in [1, 2, 3]:
+        model = models.get(day)
+        if model is not None:
+            columns = list(getattr(model, 'feature_names_in_', X.columns))
+            predictions[f'day{day}'] = np.asarray(model.predict(X[columns]), dtype=float)
+        else:
+            predictions[f'day{day}'] = X['aqi'].to_numpy(dtype=float)
+    return predictions
+
+def load_day_index(run_time, storage):
+    """Today's prediction index, or None if it could not be read (the index is then left untouched)"""
+    try:
+        return read_index(run_time.strftime('%Y-%m-%d'), storage)
+    except Exception as e:
+        print(f"Could not read the prediction index ({type(e).__name__}: {e}), skipping its update")
+        return None
+
+def load_rollups(storage):
+    """Current rollup state, or None if it could not be read (the rollups are then left untouched)"""
+    try:
+        return rollups.load_state(storage)
+    except Exception as e:
+        print(f"Could not read the rollups ({type(e).__name__}: {e}), skipping their update")
+        return None
+
+def predict():
+    start_time = time.perf_counter()
+    run_time = datetime.now()
+    storage = get_storage()
+    locations = active_locations()
     
-    # Convert to dataset and push
-    dataset = Dataset.from_pandas(df)
-    dataset.push_to_hub(REPO_ID)
+    # The live readings, the recent shard, the model bundle, today's prediction
+    # index and the rollups are independent downloads, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        current_future = pool.submit(get_current_readings, locations)
+        recent_future = pool.submit(load_recent, storage)
+        models_future = pool.submit(load_models)
+        index_future = pool.submit(load_day_index, run_time, storage)
+        rollups_future = pool.submit(load_rollups, storage)
+        
+        df = recent_future.result()
+        readings = current_future.result()
+        model_version, models = models_future.result()
+        day_index = index_future.result()
+        rollup_state = rollups_future.result()
     
-    # Save predictions
+    # Ring buffers for the rolling features, checked against the stored rows
+    store = load_store(df, storage)
+    
+    if not readings:
+        print("No live readings for any location, skipping this hour")
+        return None
+    
+    # Hours lost to skipped or failed runs come back in one ranged request and
+    # are appended ahead of the live rows, keeping each location's series hourly
+    current_time = max(timestamp for _, timestamp, _ in readings.values())
+    missing = get_missing_readings(df, current_time, locations)
+    if missing is None:
+        # Appending the live rows now would put them past the gap, which the
+        # next run's catch-up (starting at the newest stored row) would skip
+        print("Missed hours could not be fetched, skipping this hour so the next run fetches them")
+        return None
+    next_id = int(df['id'].max()) + 1 if len(df) else 0
+    if len(missing):
+        missing = catch_up_rows(missing, df)
+        missing['id'] = np.arange(next_id, next_id + len(missing))
+        df = pd.concat([df, missing], ignore_index=True)
+        store.push_frame(missing)
+        next_id += len(missing)
+        print(f"Caught up {len(missing)} missed hourly rows for {missing['location'].nunique()} locations")
+    
+    # One feature row per location, predicted in a single call per horizon model
+    features = feature_rows(readings, df, store)
+    input_df = pd.DataFrame(features)[FEATURE_COLUMNS]
+    batch = run_models(models, input_df)
+    predictions = {
+        row['location']: {k: float(v[i]) for k, v in batch.items()}
+        for i, row in enumerate(features)
+    }
+    
+    # Add one new row per location, then fill the targets the new rows resolve
+    new_rows = pd.DataFrame([dataset_row(next_id + i, row) for i, row in enumerate(features)])
+    df = pd.concat([df, new_rows], ignore_index=True)
+    df, updated_count = fill_target_values(df)
+    
+    # The top-level fields describe the original central point so existing
+    # readers keep working; every location is listed under 'locations'
+    primary = next((row for row in features if row['location'] == DEFAULT_LOCATION), features[0])
     pred_data = {
-        'timestamp': str(features['timestamp']),
-        'predictions': {k: float(v) for k, v in predictions.items()},
-        'features': features,
+        'timestamp': str(primary['timestamp']),
+        'location': primary['location'],
+        'predictions': predictions[primary['location']],
+        'features': primary,
+        'locations': {
+            row['location']: {'features': row, 'predictions': predictions[row['location']]}
+            for row in features
+        },
+        'model_version': model_version,
         'targets_updated': updated_count
     }
     
-    api = HfApi()
-    api.upload_file(
-        path_or_fileobj=json.dumps(pred_data, indent=2).encode(),
-        path_in_repo=f"predictions/pred_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-        repo_id=REPO_ID,
-        repo_type="model"
-    )
-    
-    print(f"Hourly update: {features['timestamp']}")
-    print(f"Current AQI: {features['aqi']}")
-    print(f"PM2.5: {features['pm2_5']:.1f}")
-    print(f"Predictions: Day1={predictions['day1']:.1f}, Day2={predictions['day2']:.1f}, Day3={predictions['day3']:.1f}")
+    # The record, latest.json, the dashboard snapshot and the day index go up in
+    # one commit so the dashboard's single fetch always finds the newest forecast
+    model_names = {
+        f'day{day}': getattr(model, 'model_name', type(model).__name__) if model is not None else "current AQI"
+        for day, model in models.items()
+    }
+    prediction_files = manifest_files(pred_data, run_time, day_index, model_names)
+    
+    # Fold this run's rows and forecasts into the dashboard rollups (same commit)
+    if rollup_state is not None:
+        appended = pd.concat([missing, new_rows], ignore_index=True) if len(missing) else new_rows
+        forecasts = {row['location']: (row['timestamp'], predictions[row['location']]) for row in features}
+        rollup_state = rollups.update(rollup_state, appended, forecasts)
+        prediction_files.update(rollups.state_files(rollup_state))
+    
+    # Rewrite the recent shard (sealing any day whose targets are complete)
+    # while the prediction record uploads
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        dataset_future = pool.submit(save_recent, df, storage, extra_files={STATE_FILE: store.to_json()})
+        prediction_future = pool.submit(
+            storage.commit,
+            prediction_files,
+            "model",
+            f"Prediction {primary['timestamp']}"
+        )
+        sealed_dates = dataset_future.result()
+        prediction_future.result()
+    
+    print(f"Hourly update: {primary['timestamp']}")
+    print(f"Model version: {model_version}")
+    for row in features:
+        p = predictions[row['location']]
+        print(f"{row['location']}: AQI {row['aqi']}, PM2.5 {row['pm2_5']:.1f}, "
+              f"Day1={p['day1']:.1f}, Day2={p['day2']:.1f}, Day3={p['day3']:.1f}")
     print(f"Updated {updated_count} target values from future rows")
+    if sealed_dates:
+        print(f"Sealed daily shards: {', '.join(sealed_dates)}")
+    print(f"Hourly run for {len(features)} locations took {time.perf_counter() - start_time:.1f}s")
     
     return predictions
 
+def backfill(start, end):
+    """Re-run the current models over every stored hour in [start, end) and upload the results as one Parquet file"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    
+    # Only the range plus the lookback its rolling features need and the lookahead its targets need
+    start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+    lookback, lookahead = WINDOW_HOURS * HOUR, max(TARGET_HORIZONS.values()) * HOUR
+    window = (pc.field('timestamp') >= start_ts - lookback) & (pc.field('timestamp') < end_ts + lookahead)
+    df = build_features(load_history(where=window))
+    in_range = (df['timestamp'] >= start_ts) & (df['timestamp'] < end_ts)
+    rows = df[in_range].dropna(subset=FEATURE_COLUMNS)
+    if rows.empty:
+        print(f"No stored rows between {start} and {end}")
+        return None
+    
+    model_version, models = load_models()
+    predictions = run_models(models, rows[FEATURE_COLUMNS])
+    
+    results = rows[['id', 'timestamp', 'location'] + FEATURE_COLUMNS + TARGET_COLUMNS].reset_index(drop=True)
+    for key, values in predictions.items():
+        results[f'pred_{key}'] = values
+    results['model_version'] = model_version
+    
+    path = f"predictions/backfill/backfill_{start:%Y%m%d%H}_{end:%Y%m%d%H}_{model_version}.parquet"
+    get_storage().commit({path: to_parquet_bytes(results)}, "model", f"Backfill {start} to {end}")
+    
+    print(f"Backfilled {len(results)} hourly forecasts with model {model_version} to {path}")
+    return results
+
 if __name__ == "__main__":
-    predict()
+    parser = argparse.ArgumentParser(description="Hourly AQI update and 3-day forecast")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                        help="regenerate forecasts for stored hours in [START, END) instead of the live hour")
+    args = parser.parse_args()
+    
+    if args.backfill:
+        backfill(*args.backfill)
+    else:
+        predict()
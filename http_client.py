@@ -0,0 +1,95 @@
+"""Shared HTTP client for Open-Meteo and Hugging Face fetches.
+
+One pooled requests.Session keeps connections alive across calls. GETs are
+retried a bounded number of times with jittered exponential backoff on
+connection errors, timeouts, 429 and 5xx responses. Responses that carry an
+ETag or Last-Modified header are remembered and revalidated with
+If-None-Match / If-Modified-Since, so an unchanged resource costs a 304 and the
+previous body is returned.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+
+_session = None
+_session_lock = threading.Lock()
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _cache_key(url, params):
+    return url, tuple(sorted((params or {}).items()))
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+    if retry_after is not None:
+        try:
+            return min(MAX_BACKOFF_SECONDS, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt))
+
+
+def get(url, params=None, timeout=10, retries=MAX_RETRIES, conditional=True):
+    """GET with retries and conditional revalidation.
+
+    Returns the requests.Response; on a 304 this is the previously cached
+    response. Raises requests.RequestException once retries are exhausted or
+    for non-retryable error statuses.
+    """
+    key = _cache_key(url, params)
+    with _validators_lock:
+        cached = _validators.get(key) if conditional else None
+
+    headers = {}
+    if cached is not None:
+        if cached.headers.get('ETag'):
+            headers['If-None-Match'] = cached.headers['ETag']
+        if cached.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+    session = get_session()
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            time.sleep(backoff_delay(attempt, response.headers.get('Retry-After')))
+            continue
+
+        response.raise_for_status()
+        if conditional and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            with _validators_lock:
+                _validators[key] = response
+        return response
+
+
+def get_json(url, params=None, timeout=10, retries=MAX_RETRIES):
+    return get(url, params=params, timeout=timeout, retries=retries).json()
@@ -0,0 +1,81 @@
+"""Warm-start updates for the daily models.
+
+XGBoost winners keep boosting from their current booster on the newly labelled
+rows only. Ridge winners are refit in closed form from running sufficient
+statistics (n, sums, X'X, X'y), which gives the same coefficients as fitting
+Ridge on every row seen so far. RandomForest cannot be updated in place and is
+left unchanged until the next scheduled full retrain.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error
+
+INCREMENTAL_ROUNDS = 10
+WARM_START_MODELS = ('XGBoost', 'Ridge')
+
+
+def ridge_stats(X, y):
+    """Sufficient statistics for an intercept-fitted Ridge on (X, y)"""
+    X = np.asarray(X, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    return {
+        'n': len(y),
+        'sum_x': X.sum(axis=0),
+        'sum_y': float(y.sum()),
+        'xtx': X.T @ X,
+        'xty': X.T @ y
+    }
+
+
+def merge_stats(stats, new):
+    return {
+        'n': stats['n'] + new['n'],
+        'sum_x': stats['sum_x'] + new['sum_x'],
+        'sum_y': stats['sum_y'] + new['sum_y'],
+        'xtx': stats['xtx'] + new['xtx'],
+        'xty': stats['xty'] + new['xty']
+    }
+
+
+def ridge_from_stats(stats, alpha=1.0, feature_names=None):
+    """Solve the centred Ridge normal equations and return a fitted Ridge estimator"""
+    n = stats['n']
+    mean_x = stats['sum_x'] / n
+    mean_y = stats['sum_y'] / n
+    sxx = stats['xtx'] - n * np.outer(mean_x, mean_x)
+    sxy = stats['xty'] - n * mean_x * mean_y
+
+    coef = np.linalg.solve(sxx + alpha * np.eye(len(mean_x)), sxy)
+
+    model = Ridge(alpha=alpha, random_state=42)
+    model.coef_ = coef
+    model.intercept_ = float(mean_y - mean_x @ coef)
+    model.n_features_in_ = len(coef)
+    if feature_names is not None:
+        model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return model
+
+
+def update_model(name, model, X_new, y_new, stats=None):
+    """Return (updated model, updated ridge stats) after training on the new rows only.
+
+    Returns the model unchanged for model types that cannot be warm-started.
+    """
+    if name == 'XGBoost':
+        n_estimators = model.get_params()['n_estimators']
+        model.set_params(n_estimators=INCREMENTAL_ROUNDS)
+        model.fit(X_new, y_new, xgb_model=model.get_booster())
+        model.set_params(n_estimators=n_estimators)
+        return model, stats
+
+    if name == 'Ridge' and stats is not None:
+        stats = merge_stats(stats, ridge_stats(X_new, y_new))
+        feature_names = list(X_new.columns) if isinstance(X_new, pd.DataFrame) else None
+        return ridge_from_stats(stats, model.alpha, feature_names), stats
+
+    return model, stats
+
+
+def validation_mae(model, X, y):
+    return float(mean_absolute_error(y, model.predict(X)))
@@ -0,0 +1,51 @@
+"""Monitoring points across Karachi.
+
+The hourly job fetches every active location in one batched Open-Meteo request
+and stores one dataset row per location per hour. Select the active set with
+AQI_LOCATIONS: a comma-separated list of names, or "all" (default: central).
+"""
+import os
+
+DEFAULT_LOCATION = "central"
+
+# name -> (latitude, longitude)
+KARACHI_LOCATIONS = {
+    'central': (24.8607, 67.0011),
+    'saddar': (24.8556, 67.0264),
+    'clifton': (24.8138, 67.0300),
+    'defence': (24.8000, 67.0650),
+    'lyari': (24.8697, 66.9915),
+    'kemari': (24.8186, 66.9700),
+    'site_area': (24.8990, 66.9940),
+    'orangi': (24.9500, 66.9833),
+    'baldia': (24.9280, 66.9560),
+    'north_nazimabad': (24.9420, 67.0350),
+    'north_karachi': (24.9870, 67.0640),
+    'new_karachi': (24.9950, 67.0800),
+    'gulberg': (24.9300, 67.0750),
+    'liaquatabad': (24.9080, 67.0440),
+    'gulshan_e_iqbal': (24.9204, 67.0932),
+    'gulistan_e_johar': (24.9130, 67.1300),
+    'pechs': (24.8700, 67.0600),
+    'korangi': (24.8296, 67.1200),
+    'korangi_industrial': (24.8420, 67.1000),
+    'landhi': (24.8450, 67.2050),
+    'shah_faisal': (24.8790, 67.1560),
+    'malir': (24.8930, 67.2000),
+    'bin_qasim': (24.8200, 67.3400),
+    'gadap': (25.0500, 67.1500),
+    'airport': (24.9065, 67.1608)
+}
+
+
+def active_locations():
+    """{name: (lat, lon)} for the locations selected by AQI_LOCATIONS"""
+    selected = os.getenv("AQI_LOCATIONS", DEFAULT_LOCATION).strip()
+    if selected.lower() == "all":
+        return dict(KARACHI_LOCATIONS)
+
+    names = [name.strip() for name in selected.split(",") if name.strip()]
+    unknown = [name for name in names if name not in KARACHI_LOCATIONS]
+    if unknown:
+        raise ValueError(f"Unknown AQI_LOCATIONS entries: {', '.join(unknown)}")
+    return {name: KARACHI_LOCATIONS[name] for name in names}
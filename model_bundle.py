@@ -0,0 +1,66 @@
+"""One versioned artifact holding the day 1-3 models and their metadata.
+
+The bundle is a joblib dict:
+    {'version': str, 'models': {1: model, 2: model, 3: model}, 'manifest': {...}, 'state': {...}}
+where the manifest carries the model_info_day*.json entries per horizon and the
+state holds what incremental retraining needs to resume (see daily_train). Loaded
+bundles are kept in memory, so a process downloads and unpickles it once.
+"""
+import joblib
+from datetime import datetime
+
+from features import FEATURE_COLUMNS, TARGET_HORIZONS
+from storage import get_storage
+
+BUNDLE_FILE = "models/model_bundle.joblib"
+
+_bundles = {}
+
+
+def build_bundle(models, model_infos, version=None, state=None):
+    """Package {day: model} and {day: model_info} into a bundle dict"""
+    version = version or datetime.now().strftime('%Y%m%d%H%M%S')
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'horizons': {f'day{day}': dict(model_infos[day]) for day in sorted(model_infos)}
+    }
+    bundle = {'version': version, 'models': dict(models), 'manifest': manifest, 'state': state or {}}
+    validate_bundle(bundle)
+    return bundle
+
+
+def validate_bundle(bundle):
+    """Raise ValueError unless the bundle has a model and matching metadata for every horizon"""
+    manifest = bundle.get('manifest') or {}
+    if manifest.get('version') != bundle.get('version'):
+        raise ValueError("Bundle version does not match its manifest")
+
+    for day in TARGET_HORIZONS:
+        info = manifest.get('horizons', {}).get(f'day{day}')
+        if info is None or day not in bundle.get('models', {}):
+            raise ValueError(f"Bundle {bundle.get('version')} is missing the day {day} model")
+        # Models trained before a feature was added keep working on their own columns
+        features = list(info.get('features', []))
+        if not features or set(features) - set(FEATURE_COLUMNS):
+            raise ValueError(f"Day {day} model expects features {features}, not a subset of {FEATURE_COLUMNS}")
+        if info.get('target') != f'target_day{day}':
+            raise ValueError(f"Day {day} model was trained on {info.get('target')}")
+
+
+def save_bundle(bundle, path):
+    joblib.dump(bundle, path)
+    return path
+
+
+def load_bundle(storage=None, refresh=False):
+    """Download, validate and cache the model bundle for this process"""
+    storage = storage or get_storage()
+    if not refresh and storage.name in _bundles:
+        return _bundles[storage.name]
+
+    path = storage.download(BUNDLE_FILE, "model")
+    bundle = joblib.load(path)
+    validate_bundle(bundle)
+    _bundles[storage.name] = bundle
+    return bundle
@@ -0,0 +1,184 @@
+"""Compact export of the bundle's winning models for fast, pickle-free loading.
+
+    models/compact/manifest.json    bundle version and per-horizon model info,
+                                    each naming its artifact and format
+    models/compact/day{N}.npz       RandomForest or XGBoost as flat node arrays
+                                    (forest-npz) or Ridge coefficients (linear-npz)
+
+The .npz archives are written uncompressed so every member can be memory-mapped
+straight out of the file, and are evaluated by tree_engine.py without importing
+scikit-learn or xgboost. The joblib bundle stays the training artifact (it
+carries the state incremental retraining needs); the hourly job loads these.
+"""
+import io
+import json
+
+import numpy as np
+
+from model_bundle import validate_bundle
+from storage import get_storage
+from tree_engine import LinearModel, TreeEnsemble, load_npz, node_layout
+
+COMPACT_PREFIX = "models/compact/"
+MANIFEST_FILE = "models/compact/manifest.json"
+FORMATS = {'XGBoost': 'forest-npz', 'RandomForest': 'forest-npz', 'Ridge': 'linear-npz'}
+EXTENSIONS = {'xgboost-ubj': 'ubj', 'forest-npz': 'npz', 'linear-npz': 'npz'}
+
+_compact = {}
+
+
+def artifact_path(day, fmt):
+    return f"{COMPACT_PREFIX}day{day}.{EXTENSIONS[fmt]}"
+
+
+def forest_arrays(model):
+    """Every tree of a fitted RandomForestRegressor concatenated into one set of node arrays"""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    def children(attr):
+        return np.concatenate([
+            np.where(getattr(tree, attr) < 0, -1, getattr(tree, attr) + offset)
+            for tree, offset in zip(trees, offsets)
+        ]).astype('int32')
+
+    return {
+        'roots': offsets.astype('int32'),
+        **node_layout(children('children_left'), children('children_right'),
+                      np.concatenate([tree.feature for tree in trees]).astype('int32')),
+        'threshold': np.concatenate([tree.threshold for tree in trees]).astype('float64'),
+        'value': np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype('float64'),
+        'default_left': np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool),
+        'max_depth': np.array([max(tree.max_depth for tree in trees)], dtype='int32'),
+        'bias': np.array([0.0]),
+        'scale': np.array([1.0 / len(trees)])
+    }
+
+
+def xgboost_arrays(model):
+    """The same node arrays for a fitted XGBRegressor, read from its JSON model dump.
+
+    XGBoost goes left when x < split (float32); that is x <= the next float32
+    below the split, which keeps the shared `<=` rule exact.
+    """
+    learner = json.loads(model.get_booster().save_raw(raw_format='json'))['learner']
+    if learner['objective']['name'] != 'reg:squarederror' or learner['gradient_booster']['name'] != 'gbtree':
+        raise ValueError(f"Cannot flatten {learner['gradient_booster']['name']} with {learner['objective']['name']}")
+    trees = learner['gradient_booster']['model']['trees']
+
+    roots, left, right, feature, threshold, value, default_left, depth = [], [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        tree_left = np.array(tree['left_children'])
+        leaf = tree_left < 0
+        conditions = np.array(tree['split_conditions'], dtype='float32')
+
+        roots.append(offset)
+        left.append(np.where(leaf, -1, tree_left + offset))
+        right.append(np.where(leaf, -1, np.array(tree['right_children']) + offset))
+        feature.append(np.array(tree['split_indices']))
+        threshold.append(np.where(leaf, np.nan, np.nextafter(conditions, np.float32(-np.inf))))
+        value.append(np.where(leaf, conditions, 0.0))
+        default_left.append(np.array(tree['default_left'], dtype=bool))
+
+        node_depth = np.zeros(len(tree_left), dtype=int)
+        for node in range(len(tree_left)):
+            if not leaf[node]:
+                node_depth[tree['left_children'][node]] = node_depth[tree['right_children'][node]] = node_depth[node] + 1
+        depth.append(node_depth.max())
+        offset += len(tree_left)
+
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    return {
+        'roots': np.array(roots, dtype='int32'),
+        **node_layout(np.concatenate(left).astype('int32'), np.concatenate(right).astype('int32'),
+                      np.concatenate(feature).astype('int32')),
+        'threshold': np.concatenate(threshold).astype('float64'),
+        'value': np.concatenate(value).astype('float64'),
+        'default_left': np.concatenate(default_left),
+        'max_depth': np.array([max(depth)], dtype='int32'),
+        'bias': np.array([base_score]),
+        'scale': np.array([1.0])
+    }
+
+
+def linear_arrays(model):
+    return {
+        'coef': np.asarray(model.coef_, dtype='float64').ravel(),
+        'intercept': np.array([model.intercept_], dtype='float64').ravel()
+    }
+
+
+def npz_bytes(arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def export_model(model, name):
+    """(format, bytes) for one fitted model"""
+    fmt = FORMATS.get(name)
+    if name == 'XGBoost':
+        return fmt, npz_bytes(xgboost_arrays(model))
+    if fmt == 'forest-npz':
+        return fmt, npz_bytes(forest_arrays(model))
+    if fmt == 'linear-npz':
+        return fmt, npz_bytes(linear_arrays(model))
+    raise ValueError(f"No compact format for model type {name}")
+
+
+def export_files(bundle):
+    """{path: bytes} for the compact manifest and one artifact per horizon"""
+    manifest = {key: value for key, value in bundle['manifest'].items() if key != 'horizons'}
+    manifest['horizons'] = {}
+    files = {}
+    for key, info in bundle['manifest']['horizons'].items():
+        day = int(key.removeprefix('day'))
+        fmt, data = export_model(bundle['models'][day], info['model_name'])
+        path = artifact_path(day, fmt)
+        files[path] = data
+        manifest['horizons'][key] = dict(info, artifact=path, format=fmt)
+    files[MANIFEST_FILE] = json.dumps(manifest, indent=2).encode()
+    return files
+
+
+class XGBoostModel:
+    """Booster loaded from UBJSON, for manifests that predate the tree arrays"""
+
+    def __init__(self, path):
+        import xgboost as xgb
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+
+    def predict(self, X):
+        return self.booster.inplace_predict(X)
+
+
+def load_artifact(path, fmt):
+    if fmt == 'xgboost-ubj':
+        return XGBoostModel(path)
+    if fmt == 'forest-npz':
+        return TreeEnsemble(load_npz(path))
+    if fmt == 'linear-npz':
+        return LinearModel(load_npz(path))
+    raise ValueError(f"Unknown compact model format {fmt}")
+
+
+def load_compact(storage=None, refresh=False):
+    """(version, {day: model}) from the compact export, cached for this process"""
+    storage = storage or get_storage()
+    if not refresh and storage.name in _compact:
+        return _compact[storage.name]
+
+    manifest = json.loads(storage.read_bytes(MANIFEST_FILE, "model"))
+    models = {}
+    for key, info in manifest['horizons'].items():
+        model = load_artifact(storage.download(info['artifact'], "model"), info['format'])
+        model.feature_names_in_ = np.asarray(info['features'], dtype=object)
+        model.model_name = info['model_name']
+        models[int(key.removeprefix('day'))] = model
+    validate_bundle({'version': manifest['version'], 'models': models, 'manifest': manifest})
+
+    _compact[storage.name] = (manifest['version'], models)
+    return _compact[storage.name]
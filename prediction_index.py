@@ -0,0 +1,102 @@
+"""Small manifest files that make the newest forecast a single fetch.
+
+    predictions/latest.json               copy of the newest prediction record
+                                          plus prediction_timestamp and path
+    predictions/index/YYYY-MM-DD.json     [{path, timestamp, prediction_timestamp}, ...]
+                                          for every prediction made that day
+    predictions/dashboard.json            everything the dashboard renders for the
+                                          central point, already classified
+
+hourly_predict commits them alongside each predictions/pred_*.json record, so
+readers never have to list the growing predictions/ tree and the dashboard's
+reading and forecast always come from the same run.
+"""
+import json
+
+import pandas as pd
+
+from aqi import forecast_rows, get_aqi_info
+from locations import DEFAULT_LOCATION, KARACHI_LOCATIONS
+from storage import get_storage
+
+LATEST_FILE = "predictions/latest.json"
+INDEX_PREFIX = "predictions/index/"
+SNAPSHOT_FILE = "predictions/dashboard.json"
+
+
+def prediction_path(run_time):
+    return f"predictions/pred_{run_time.strftime('%Y%m%d_%H%M')}.json"
+
+
+def index_path(date):
+    return f"{INDEX_PREFIX}{date}.json"
+
+
+def read_index(date, storage=None):
+    """Entries of one day's index, [] if no prediction was made that day yet.
+
+    Errors other than a missing file propagate, so a failed read never causes
+    the index to be rewritten from scratch.
+    """
+    storage = storage or get_storage()
+    try:
+        return json.loads(storage.read_bytes(index_path(date), "model"))
+    except FileNotFoundError:
+        return []
+
+
+def location_label(location):
+    lat, lon = KARACHI_LOCATIONS.get(location, KARACHI_LOCATIONS[DEFAULT_LOCATION])
+    name = "Karachi" if location == DEFAULT_LOCATION else f"Karachi {location.replace('_', ' ').title()}"
+    return f"{name} ({lat:.2f}°N, {lon:.2f}°E)"
+
+
+def dashboard_snapshot(pred_data, run_time, model_names=None):
+    """The dashboard payload for a prediction record: reading, forecasts, levels and timestamps"""
+    features = pred_data['features']
+    reading_hour = pd.Timestamp(features['timestamp']).floor('h')
+    current = {
+        'aqi': features['aqi'],
+        'pm25': features['pm2_5'],
+        'timestamp': reading_hour.isoformat(),
+        'display_time': reading_hour.strftime('%H:00 UTC'),
+        'location': location_label(pred_data.get('location', DEFAULT_LOCATION)),
+        'source': "Open-Meteo API (Hourly)",
+        'info': get_aqi_info(features['aqi'])
+    }
+    predictions = {
+        'status': "success",
+        'timestamp': pred_data['timestamp'],
+        'prediction_timestamp': run_time.isoformat(),
+        'predictions': pred_data['predictions'],
+        'model_version': pred_data.get('model_version')
+    }
+    return {
+        'generated_at': run_time.isoformat(),
+        'current': current,
+        'predictions': predictions,
+        'forecast': forecast_rows(features['aqi'], pred_data['predictions']),
+        'model_version': pred_data.get('model_version'),
+        'models': model_names or {}
+    }
+
+
+def manifest_files(pred_data, run_time, index_entries=None, model_names=None):
+    """{path: bytes} for a prediction record, latest.json, the dashboard snapshot and (if given) the updated day index"""
+    path = prediction_path(run_time)
+    latest = dict(pred_data, prediction_timestamp=run_time.isoformat(), path=path)
+
+    files = {
+        path: json.dumps(pred_data, indent=2).encode(),
+        LATEST_FILE: json.dumps(latest, indent=2).encode(),
+        SNAPSHOT_FILE: json.dumps(dashboard_snapshot(pred_data, run_time, model_names), ensure_ascii=False).encode()
+    }
+    if index_entries is not None:
+        entries = [entry for entry in index_entries if entry['path'] != path]
+        entries.append({
+            'path': path,
+            'timestamp': pred_data['timestamp'],
+            'prediction_timestamp': latest['prediction_timestamp']
+        })
+        files[index_path(run_time.strftime('%Y-%m-%d'))] = json.dumps(entries, indent=2).encode()
+    return files
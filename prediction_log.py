@@ -0,0 +1,159 @@
+"""Monthly Parquet log of past forecasts.
+
+    predictions/log/YYYY-MM.parquet    one row per location per hourly prediction
+
+Each hourly run still writes its own predictions/pred_YYYYMMDD_HHMM.json. The
+compaction job folds records older than KEEP_DAYS into the partition of the
+month their reading falls in and removes the JSON files (and their day index
+files) in the same commit, so forecast history is read one file per month.
+"""
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dataset_store import to_parquet_bytes
+from features import FEATURE_COLUMNS, to_datetime
+from locations import DEFAULT_LOCATION
+from prediction_index import INDEX_PREFIX, index_path
+from storage import get_storage
+
+LOG_PREFIX = "predictions/log/"
+RECORD_PREFIX = "predictions/pred_"
+# Recent records stay as JSON so the dashboard's index fallback can still find them
+KEEP_DAYS = 2
+
+LOG_DTYPES = {
+    'prediction_timestamp': 'Int64',
+    'timestamp': 'Int64',
+    'location': 'string',
+    **{col: 'float64' for col in FEATURE_COLUMNS},
+    'pred_day1': 'float64',
+    'pred_day2': 'float64',
+    'pred_day3': 'float64',
+    'model_version': 'string',
+    'path': 'string'
+}
+
+
+def log_path(month):
+    return f"{LOG_PREFIX}{month}.parquet"
+
+
+def record_time(path):
+    """Run time encoded in a predictions/pred_YYYYMMDD_HHMM.json path"""
+    return datetime.strptime(path[len(RECORD_PREFIX):-len(".json")], '%Y%m%d_%H%M')
+
+
+def record_rows(record, path):
+    """One log row per location in a prediction record (older records hold a single location)"""
+    locations = record.get('locations') or {
+        record.get('location', DEFAULT_LOCATION): {'features': record['features'], 'predictions': record['predictions']}
+    }
+    run_time = int(pd.Timestamp(record_time(path)).timestamp())
+
+    rows = []
+    for location, entry in locations.items():
+        features, predictions = entry['features'], entry['predictions']
+        row = {
+            'prediction_timestamp': run_time,
+            'timestamp': int(pd.Timestamp(features['timestamp']).timestamp()),
+            'location': location,
+            'model_version': record.get('model_version'),
+            'path': path
+        }
+        row.update({col: features.get(col) for col in FEATURE_COLUMNS})
+        row.update({f'pred_{day}': predictions.get(day) for day in ['day1', 'day2', 'day3']})
+        rows.append(row)
+    return rows
+
+
+def normalize_log(df):
+    df = df.copy()
+    for col, dtype in LOG_DTYPES.items():
+        values = df[col] if col in df else pd.Series(None, index=df.index, dtype='float64')
+        df[col] = values.astype(dtype)
+    return df[list(LOG_DTYPES)].sort_values(['timestamp', 'location'], kind='stable').reset_index(drop=True)
+
+
+def read_partition(month, storage):
+    try:
+        return pd.read_parquet(storage.download(log_path(month), "model", force=True))
+    except FileNotFoundError:
+        return None
+
+
+def compact(storage=None, keep_days=KEEP_DAYS):
+    """Fold prediction records older than keep_days into the monthly log partitions"""
+    storage = storage or get_storage()
+    cutoff = (datetime.now() - timedelta(days=keep_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    paths = sorted(
+        path for path in storage.list_files("model", prefix=RECORD_PREFIX)
+        if path.endswith(".json") and record_time(path) < cutoff
+    )
+    if not paths:
+        print("No prediction records to compact")
+        return []
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        records = list(pool.map(lambda path: json.loads(storage.read_bytes(path, "model")), paths))
+
+    rows = [row for record, path in zip(records, paths) for row in record_rows(record, path)]
+    new = normalize_log(pd.DataFrame(rows))
+    months = to_datetime(new['timestamp']).dt.strftime('%Y-%m')
+
+    files = {}
+    for month, part in new.groupby(months):
+        existing = read_partition(month, storage)
+        if existing is not None:
+            part = pd.concat([existing, part], ignore_index=True)
+        # Re-running after a partial failure must not duplicate rows
+        part = normalize_log(part.drop_duplicates(subset=['path', 'location'], keep='last'))
+        files[log_path(month)] = to_parquet_bytes(part)
+
+    days = sorted({record_time(path).strftime('%Y-%m-%d') for path in paths})
+    index_files = set(storage.list_files("model", prefix=INDEX_PREFIX))
+    delete = paths + [index_path(day) for day in days if index_path(day) in index_files]
+
+    storage.commit(files, "model", f"Compact {len(paths)} prediction records", delete=delete)
+    print(f"Compacted {len(paths)} prediction records into {len(files)} monthly partitions: {', '.join(sorted(files))}")
+    return sorted(files)
+
+
+def read_log(start=None, end=None, location=None, storage=None):
+    """Logged forecasts whose reading time falls in [start, end), optionally for one location.
+
+    Only the monthly partitions overlapping the range are downloaded.
+    """
+    storage = storage or get_storage()
+    months = sorted(
+        path[len(LOG_PREFIX):-len(".parquet")]
+        for path in storage.list_files("model", prefix=LOG_PREFIX) if path.endswith(".parquet")
+    )
+
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        months = [m for m in months if m >= start.strftime('%Y-%m')]
+        filters.append(('timestamp', '>=', int(start.timestamp())))
+    if end is not None:
+        end = pd.Timestamp(end)
+        months = [m for m in months if m <= end.strftime('%Y-%m')]
+        filters.append(('timestamp', '<', int(end.timestamp())))
+    if location is not None:
+        filters.append(('location', '=', location))
+
+    tables = [pq.read_table(storage.download(log_path(m), "model"), filters=filters or None) for m in months]
+    if not tables:
+        return normalize_log(pd.DataFrame(columns=list(LOG_DTYPES)))
+    return normalize_log(pd.concat([t.to_pandas() for t in tables], ignore_index=True))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["compact"]:
+        compact()
+    else:
+        print("Usage: python prediction_log.py compact")
@@ -0,0 +1,237 @@
+"""Pre-aggregated AQI / PM2.5 history for the dashboard, updated with every hourly run.
+
+    rollups/daily.parquet     one row per location per day
+    rollups/weekly.parquet    one row per location per week (weeks start on Monday)
+
+Each row holds min / mean / max / p95 of AQI and PM2.5, the reading count and,
+per forecast horizon, the summed absolute error and count of forecasts whose
+target hour fell in the period (so MAE = sum / count).
+
+Percentiles cannot be merged from summaries, so two small state files make the
+update exact without rereading history:
+
+    rollups/open_rows.parquet    raw readings from the week of the location that
+                                 is furthest behind; a new row is later than its
+                                 location's stored rows, so only open buckets change
+    rollups/pending.parquet      forecasts waiting for the reading of their
+                                 target hour
+
+Run `python rollups.py rebuild` once to seed everything from the full dataset
+and the compacted prediction log.
+"""
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_history, to_parquet_bytes
+from features import HOUR, TARGET_HORIZONS, to_datetime
+from storage import get_storage
+
+ROLLUP_PREFIX = "rollups/"
+PERIODS = ('daily', 'weekly')
+OPEN_ROWS_FILE = "rollups/open_rows.parquet"
+PENDING_FILE = "rollups/pending.parquet"
+
+KEYS = ['location', 'period']
+READING_COLUMNS = ['location', 'timestamp', 'aqi', 'pm2_5']
+READING_DTYPES = {'location': 'object', 'timestamp': 'int64', 'aqi': 'float64', 'pm2_5': 'float64'}
+PENDING_COLUMNS = ['location', 'timestamp', 'horizon', 'predicted']
+PENDING_DTYPES = {'location': 'object', 'timestamp': 'int64', 'horizon': 'int64', 'predicted': 'float64'}
+STAT_COLUMNS = [f'{col}_{stat}' for col in ['aqi', 'pm2_5'] for stat in ['min', 'mean', 'max', 'p95']] + ['count']
+ERROR_COLUMNS = [f'{kind}_day{day}' for day in TARGET_HORIZONS for kind in ['abs_error_sum', 'error_count']]
+
+
+def rollup_path(period):
+    return f"{ROLLUP_PREFIX}{period}.parquet"
+
+
+def period_start(timestamps, period):
+    """Epoch second at which the day or week containing each timestamp starts"""
+    days = to_datetime(pd.Series(np.asarray(timestamps, dtype='int64'))).dt.floor('D')
+    if period == 'weekly':
+        days = days - pd.to_timedelta(days.dt.dayofweek, unit='D')
+    return days.dt.as_unit('s').astype('int64').to_numpy()
+
+
+def empty_table():
+    return pd.DataFrame(columns=KEYS + STAT_COLUMNS + ERROR_COLUMNS)
+
+
+def empty_state():
+    state = {period: empty_table() for period in PERIODS}
+    state['open_rows'] = pd.DataFrame(columns=READING_COLUMNS).astype(READING_DTYPES)
+    state['pending'] = pd.DataFrame(columns=PENDING_COLUMNS).astype(PENDING_DTYPES)
+    return state
+
+
+def summarize(readings, period):
+    """Reading statistics per (location, period) for a frame of readings"""
+    grouped = readings.assign(period=period_start(readings['timestamp'], period)).groupby(KEYS)
+    stats = {}
+    for col in ['aqi', 'pm2_5']:
+        values = grouped[col]
+        stats[f'{col}_min'] = values.min()
+        stats[f'{col}_mean'] = values.mean()
+        stats[f'{col}_max'] = values.max()
+        stats[f'{col}_p95'] = values.quantile(0.95)
+    stats['count'] = grouped.size()
+    return pd.DataFrame(stats).astype('float64')
+
+
+def error_sums(errors, period):
+    """Summed absolute forecast error and forecast count per (location, period) and horizon"""
+    errors = errors.assign(period=period_start(errors['timestamp'], period))
+    sums = errors.groupby(KEYS + ['horizon'])['abs_error'].agg(['sum', 'count']).unstack('horizon')
+    columns = {}
+    for day in TARGET_HORIZONS:
+        columns[f'abs_error_sum_day{day}'] = sums['sum'][day] if day in sums['sum'] else 0.0
+        columns[f'error_count_day{day}'] = sums['count'][day] if day in sums['count'] else 0.0
+    return pd.DataFrame(columns, index=sums.index).fillna(0.0)[ERROR_COLUMNS].astype('float64')
+
+
+def forecasts_frame(forecasts):
+    """Pending-forecast rows for {location: (reading timestamp, {'day1': value, ...})}"""
+    rows = [
+        {
+            'location': location,
+            'timestamp': int(pd.Timestamp(timestamp).floor('h').timestamp()) + offset * HOUR,
+            'horizon': day,
+            'predicted': float(predictions[f'day{day}'])
+        }
+        for location, (timestamp, predictions) in forecasts.items()
+        for day, offset in TARGET_HORIZONS.items()
+    ]
+    return pd.DataFrame(rows, columns=PENDING_COLUMNS).astype(PENDING_DTYPES)
+
+
+def match_forecasts(pending, readings):
+    """Split pending forecasts into (errors against the readings for their target hour, still pending)"""
+    if pending.empty or readings.empty:
+        return pd.DataFrame(columns=['location', 'timestamp', 'horizon', 'abs_error']), pending
+
+    actual = readings.assign(hour=readings['timestamp'].to_numpy(dtype='int64') // HOUR)
+    actual = actual.drop_duplicates(subset=['location', 'hour'], keep='last')[['location', 'hour', 'aqi']]
+    merged = pending.assign(hour=pending['timestamp'].to_numpy(dtype='int64') // HOUR).merge(
+        actual, on=['location', 'hour'], how='left'
+    )
+
+    matched = merged['aqi'].notna().to_numpy()
+    errors = merged[matched]
+    errors = errors.assign(abs_error=(errors['aqi'] - errors['predicted']).abs())
+    return errors[['location', 'timestamp', 'horizon', 'abs_error']], pending[~matched].reset_index(drop=True)
+
+
+def update_table(table, stats, errors):
+    """Replace the statistics of the touched buckets and add their new forecast errors"""
+    table = table.set_index(KEYS) if len(table) else pd.DataFrame(columns=STAT_COLUMNS + ERROR_COLUMNS)
+    index = table.index.union(stats.index).union(errors.index)
+    table = table.reindex(index)
+
+    table.loc[stats.index, STAT_COLUMNS] = stats[STAT_COLUMNS].to_numpy()
+    table[ERROR_COLUMNS] = table[ERROR_COLUMNS].astype('float64').fillna(0.0) + errors.reindex(index, fill_value=0.0)
+    table.index.names = KEYS
+    table = table.astype({col: 'float64' for col in STAT_COLUMNS + ERROR_COLUMNS})
+    return table.reset_index().sort_values(['period', 'location'], kind='stable').reset_index(drop=True)
+
+
+def update(state, readings, forecasts=None):
+    """Fold new dataset rows and this run's forecasts into the rollup state.
+
+    `readings` holds only rows newer than everything already folded in for
+    their location (a location catching up may lag the others);
+    `forecasts` is {location: (reading timestamp, predictions)}.
+    """
+    readings = readings[READING_COLUMNS].astype(READING_DTYPES)
+    if readings.empty:
+        return state
+
+    # Every bucket the new rows touch lies at or after their location's newest stored week,
+    # so it is fully covered by open_rows + readings
+    open_rows = pd.concat([state['open_rows'], readings], ignore_index=True).astype(READING_DTYPES)
+    errors, pending = match_forecasts(state['pending'], readings)
+    if forecasts:
+        pending = pd.concat([pending, forecasts_frame(forecasts)], ignore_index=True).astype(PENDING_DTYPES)
+
+    # Anything at or before its location's newest reading can no longer be matched
+    newest = open_rows.groupby('location')['timestamp'].max()
+    location_newest = pending['location'].map(newest).fillna(-1).to_numpy(dtype='int64')
+    pending = pending[pending['timestamp'].to_numpy() // HOUR > location_newest // HOUR].reset_index(drop=True)
+
+    new_state = {'pending': pending}
+    for period in PERIODS:
+        touched = set(zip(readings['location'], period_start(readings['timestamp'], period)))
+        keys = list(zip(open_rows['location'], period_start(open_rows['timestamp'], period)))
+        in_touched = np.fromiter((key in touched for key in keys), dtype=bool, count=len(keys))
+        stats = summarize(open_rows[in_touched], period)
+        period_errors = error_sums(errors, period) if len(errors) else pd.DataFrame(columns=ERROR_COLUMNS)
+        new_state[period] = update_table(state[period], stats, period_errors)
+
+    # Keep the weeks the location furthest behind can still catch up into
+    open_week = period_start([newest.min()], 'weekly')[0]
+    new_state['open_rows'] = open_rows[period_start(open_rows['timestamp'], 'weekly') >= open_week].reset_index(drop=True)
+    return new_state
+
+
+def state_files(state):
+    """{path: bytes} for every rollup and state file"""
+    files = {rollup_path(period): to_parquet_bytes(state[period]) for period in PERIODS}
+    files[OPEN_ROWS_FILE] = to_parquet_bytes(state['open_rows'])
+    files[PENDING_FILE] = to_parquet_bytes(state['pending'])
+    return files
+
+
+def load_state(storage=None):
+    """Current rollup state; missing files start empty, other errors propagate"""
+    storage = storage or get_storage()
+    state = empty_state()
+    paths = {period: rollup_path(period) for period in PERIODS}
+    paths.update({'open_rows': OPEN_ROWS_FILE, 'pending': PENDING_FILE})
+    for key, path in paths.items():
+        try:
+            state[key] = pd.read_parquet(io.BytesIO(storage.read_bytes(path, "model")))
+        except FileNotFoundError:
+            pass
+    return state
+
+
+def rebuild(storage=None):
+    """Recompute every rollup from the full dataset and the compacted prediction log"""
+    from prediction_log import read_log
+
+    storage = storage or get_storage()
+    history = load_history(storage, columns=READING_COLUMNS).dropna().astype(READING_DTYPES)
+    if history.empty:
+        print("No history to roll up")
+        return None
+
+    log = read_log(storage=storage)
+    forecasts = pd.concat([
+        pd.DataFrame({
+            'location': log['location'].astype('object'),
+            'timestamp': (log['timestamp'].astype('int64') // HOUR + offset) * HOUR,
+            'horizon': day,
+            'predicted': log[f'pred_day{day}']
+        })
+        for day, offset in TARGET_HORIZONS.items()
+    ], ignore_index=True).dropna()
+    errors, _ = match_forecasts(forecasts, history)
+
+    state = {'pending': pd.DataFrame(columns=PENDING_COLUMNS)}
+    for period in PERIODS:
+        period_errors = error_sums(errors, period) if len(errors) else pd.DataFrame(columns=ERROR_COLUMNS)
+        state[period] = update_table(empty_table(), summarize(history, period), period_errors)
+    newest_week = period_start([history['timestamp'].max()], 'weekly')[0]
+    state['open_rows'] = history[period_start(history['timestamp'], 'weekly') >= newest_week].reset_index(drop=True)
+
+    storage.commit(state_files(state), "model", "Rebuild rollups")
+    print(f"Rebuilt {len(state['daily'])} daily and {len(state['weekly'])} weekly rollup rows")
+    return state
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        rebuild()
+    else:
+        print("Usage: python rollups.py rebuild")
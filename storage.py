@@ -0,0 +1,174 @@
+"""Storage backends for dataset shards, model artifacts and prediction records.
+
+Both backends expose the same small file API over two namespaces, "dataset"
+(the hourly shards) and "model" (bundles, metadata, prediction JSON):
+
+    snapshot(repo_type, prefix)      -> (revision, {path: content_key})
+    download(path, repo_type, ...)   -> local file path (FileNotFoundError if absent)
+    read_bytes(path, repo_type)      -> bytes
+    list_files(repo_type, prefix)    -> [path, ...]
+    commit(files, repo_type, ...)    -> new revision; files is {path: bytes or local path}
+
+HubStorage talks to the Hugging Face Hub; LocalStorage keeps the same layout
+under a directory so the pipeline can run and be profiled without a network.
+Pick one with AQI_STORAGE=hub|local (and AQI_LOCAL_ROOT for the local root).
+"""
+import os
+import shutil
+
+from dotenv import load_dotenv
+from huggingface_hub import HfApi, hf_hub_download, CommitOperationAdd, CommitOperationDelete
+from huggingface_hub.utils import EntryNotFoundError, LocalEntryNotFoundError
+
+load_dotenv()
+
+REPO_ID = "Syed110-3/karachi-aqi-predictor"
+DEFAULT_LOCAL_ROOT = "local_store"
+
+_storage = None
+
+
+class HubStorage:
+    def __init__(self, repo_id=REPO_ID, token=None):
+        self.repo_id = repo_id
+        self.token = token or os.getenv("HF_TOKEN")
+        if not self.token:
+            raise ValueError("HF_TOKEN not found. Create .env file with HF_TOKEN=your_token or set AQI_STORAGE=local")
+        self.api = HfApi(token=self.token)
+        self.name = f"hub:{repo_id}"
+
+    def snapshot(self, repo_type, prefix=""):
+        info = self.api.repo_info(self.repo_id, repo_type=repo_type, files_metadata=True)
+        files = {}
+        for sibling in info.siblings:
+            if not sibling.rfilename.startswith(prefix):
+                continue
+            if sibling.lfs:
+                lfs = sibling.lfs
+                files[sibling.rfilename] = lfs['sha256'] if isinstance(lfs, dict) else lfs.sha256
+            else:
+                files[sibling.rfilename] = sibling.blob_id
+        return info.sha, files
+
+    def list_files(self, repo_type, prefix=""):
+        return [f for f in self.api.list_repo_files(self.repo_id, repo_type=repo_type) if f.startswith(prefix)]
+
+    def download(self, path, repo_type, revision=None, local_dir=None, force=False):
+        try:
+            return hf_hub_download(
+                repo_id=self.repo_id,
+                filename=path,
+                repo_type=repo_type,
+                revision=revision,
+                local_dir=local_dir,
+                token=self.token,
+                force_download=force
+            )
+        except LocalEntryNotFoundError as e:
+            # The Hub could not be reached, which says nothing about whether the file exists
+            raise ConnectionError(f"Could not reach the Hub to fetch {path}") from e
+        except EntryNotFoundError as e:
+            raise FileNotFoundError(f"{path} not found in {repo_type} repo {self.repo_id}") from e
+
+    def read_bytes(self, path, repo_type):
+        with open(self.download(path, repo_type, force=True), 'rb') as f:
+            return f.read()
+
+    def commit(self, files, repo_type, message, delete=()):
+        operations = [CommitOperationAdd(path_in_repo=path, path_or_fileobj=data) for path, data in files.items()]
+        operations += [CommitOperationDelete(path_in_repo=path) for path in delete]
+        commit = self.api.create_commit(
+            repo_id=self.repo_id,
+            repo_type=repo_type,
+            operations=operations,
+            commit_message=message
+        )
+        return commit.oid
+
+
+class LocalStorage:
+    REVISION_FILE = ".revision"
+
+    def __init__(self, root=DEFAULT_LOCAL_ROOT):
+        self.root = os.path.abspath(root)
+        self.name = f"local:{self.root}"
+
+    def _dir(self, repo_type):
+        return os.path.join(self.root, repo_type)
+
+    def _path(self, path, repo_type):
+        return os.path.join(self._dir(repo_type), path)
+
+    def _revision(self, repo_type):
+        try:
+            with open(os.path.join(self._dir(repo_type), self.REVISION_FILE)) as f:
+                return f.read().strip()
+        except OSError:
+            return "0"
+
+    def snapshot(self, repo_type, prefix=""):
+        files = {}
+        base = self._dir(repo_type)
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                path = os.path.relpath(full, base).replace(os.sep, "/")
+                if path == self.REVISION_FILE or not path.startswith(prefix):
+                    continue
+                stat = os.stat(full)
+                files[path] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        return self._revision(repo_type), files
+
+    def list_files(self, repo_type, prefix=""):
+        return sorted(self.snapshot(repo_type, prefix)[1])
+
+    def download(self, path, repo_type, revision=None, local_dir=None, force=False):
+        source = self._path(path, repo_type)
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"{path} not found in local {repo_type} storage at {self.root}")
+        if local_dir is None:
+            return source
+        target = os.path.join(local_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Replace rather than overwrite so memory-mapped readers of the old copy stay valid
+        shutil.copyfile(source, target + ".tmp")
+        os.replace(target + ".tmp", target)
+        return target
+
+    def read_bytes(self, path, repo_type):
+        with open(self.download(path, repo_type), 'rb') as f:
+            return f.read()
+
+    def commit(self, files, repo_type, message, delete=()):
+        for path, data in files.items():
+            target = self._path(path, repo_type)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if isinstance(data, (bytes, bytearray)):
+                with open(target + ".tmp", 'wb') as f:
+                    f.write(data)
+                os.replace(target + ".tmp", target)
+            else:
+                shutil.copyfile(data, target)
+        for path in delete:
+            if os.path.exists(self._path(path, repo_type)):
+                os.remove(self._path(path, repo_type))
+
+        revision = str(int(self._revision(repo_type)) + 1)
+        os.makedirs(self._dir(repo_type), exist_ok=True)
+        with open(os.path.join(self._dir(repo_type), self.REVISION_FILE), 'w') as f:
+            f.write(revision)
+        return revision
+
+
+def get_storage():
+    """Process-wide storage backend selected by AQI_STORAGE (default: hub)"""
+    global _storage
+    if _storage is None:
+        backend = os.getenv("AQI_STORAGE", "hub").lower()
+        if backend == "local":
+            _storage = LocalStorage(os.getenv("AQI_LOCAL_ROOT", DEFAULT_LOCAL_ROOT))
+        elif backend == "hub":
+            _storage = HubStorage()
+        else:
+            raise ValueError(f"Unknown AQI_STORAGE backend: {backend} (expected 'hub' or 'local')")
+    return _storage
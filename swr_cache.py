@@ -0,0 +1,104 @@
+"""Process-wide stale-while-revalidate cache for the dashboard.
+
+Every key has a loader. Readers always get the last good value straight from
+memory; a single background thread reloads all keys just after the hourly
+publish (HH:01:30 by default) and retries keys whose fresh check fails every
+RETRY_SECONDS until the next slot. Only that thread talks to the upstream
+APIs, so the number of sessions never changes the upstream request rate.
+"""
+import threading
+from datetime import datetime, timedelta
+
+PUBLISH_OFFSET = timedelta(minutes=1, seconds=30)
+RETRY_SECONDS = 60
+FIRST_LOAD_TIMEOUT = 30
+
+
+def next_refresh(now=None, offset=PUBLISH_OFFSET):
+    """The next HH:MM:SS after `now` that is `offset` past an hour"""
+    now = now or datetime.now()
+    slot = now.replace(minute=0, second=0, microsecond=0) + offset
+    return slot if slot > now else slot + timedelta(hours=1)
+
+
+class SWRCache:
+    def __init__(self, loaders, fresh=None, offset=PUBLISH_OFFSET, retry_seconds=RETRY_SECONDS):
+        """loaders: {key: fn() -> value}; fresh: optional {key: fn(value) -> bool}"""
+        self.loaders = dict(loaders)
+        self.fresh = dict(fresh or {})
+        self.offset = offset
+        self.retry_seconds = retry_seconds
+        self.values = {}
+        self.loaded_at = {}
+        self.errors = {}
+        self.upstream_loads = 0
+        self._lock = threading.Lock()
+        # Set per key once its first load has been attempted
+        self._first_load = {key: threading.Event() for key in self.loaders}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, keys=None):
+        """Reload the given keys (default: all), keeping the old value when a load fails.
+
+        Returns the keys whose new value is still not fresh.
+        """
+        stale = []
+        for key in keys or list(self.loaders):
+            try:
+                value = self.loaders[key]()
+            except Exception as e:
+                self.errors[key] = f"{type(e).__name__}: {e}"
+                stale.append(key)
+                self._first_load[key].set()
+                continue
+            with self._lock:
+                self.values[key] = value
+                self.loaded_at[key] = datetime.now()
+                self.upstream_loads += 1
+            self._first_load[key].set()
+            self.errors.pop(key, None)
+            if key in self.fresh and not self.fresh[key](value):
+                stale.append(key)
+        return stale
+
+    def _run(self):
+        stale = self.refresh()
+        while not self._stop.is_set():
+            slot = next_refresh(offset=self.offset)
+            if stale:
+                wait = min(self.retry_seconds, (slot - datetime.now()).total_seconds())
+                if self._stop.wait(max(wait, 0)):
+                    return
+                stale = self.refresh(stale) if datetime.now() < slot else self.refresh()
+            else:
+                if self._stop.wait(max((slot - datetime.now()).total_seconds(), 0)):
+                    return
+                stale = self.refresh()
+
+    def start(self):
+        """Start the background refresher (idempotent)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="swr-cache", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, key, default=None):
+        """Last good value for key (default if none yet); only the first calls in a process wait for its initial load"""
+        first_load = self._first_load.get(key)
+        if first_load is not None and not first_load.is_set():
+            first_load.wait(FIRST_LOAD_TIMEOUT)
+        with self._lock:
+            return self.values.get(key, default)
+
+    def status(self):
+        """{key: {'loaded_at', 'error'}} for the debug panel"""
+        with self._lock:
+            return {
+                key: {'loaded_at': self.loaded_at.get(key), 'error': self.errors.get(key)}
+                for key in self.loaders
+            }
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from aqi import PM25_BREAKPOINTS, aqi_to_pm25, pm25_to_aqi
+
+
+@pytest.mark.parametrize("pm25, aqi", [
+    (0.0, 0), (12.0, 50), (12.1, 51), (35.4, 100), (35.5, 101), (55.4, 150), (55.5, 151),
+    (150.4, 200), (150.5, 201), (250.4, 300), (250.5, 301), (350.4, 400), (350.5, 401), (500.4, 500)
+])
+def test_breakpoint_edges(pm25, aqi):
+    assert pm25_to_aqi(pm25) == aqi
+
+
+def test_truncates_to_tenths_and_caps():
+    # 12.09 truncates to 12.0, not up into the next segment
+    assert pm25_to_aqi(12.09) == 50
+    assert pm25_to_aqi(35.9) == 102
+    assert pm25_to_aqi(900.0) == 500
+    assert pm25_to_aqi(-1.0) == 0
+
+
+def test_array_and_nan():
+    values = pm25_to_aqi([12.0, np.nan, 55.5])
+    np.testing.assert_array_equal(values, [50, np.nan, 151])
+
+
+def test_inverse_round_trips_segment_ends():
+    ends = PM25_BREAKPOINTS[:, 3]
+    np.testing.assert_allclose(aqi_to_pm25(ends), PM25_BREAKPOINTS[:, 1])
+    np.testing.assert_array_equal(pm25_to_aqi(aqi_to_pm25(ends)), ends)
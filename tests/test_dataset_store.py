@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import dataset_cache
+from dataset_store import (
+    DAILY_SHARD_PREFIX, TARGET_COLUMNS, UNRESOLVABLE_AFTER, load_history, load_recent, normalize, save_recent,
+    split_sealed, to_table
+)
+from features import HOUR, fill_targets
+from storage import LocalStorage
+
+START = 1672531200  # 2023-01-01 00:00 UTC
+
+
+def history(days, location='central', unresolved_hours=72):
+    """Hourly rows whose last `unresolved_hours` still wait on a target"""
+    n = days * 24
+    df = pd.DataFrame({
+        'id': np.arange(n),
+        'timestamp': START + HOUR * np.arange(n),
+        'location': location,
+        'aqi': 100,
+        'pm2_5': 35.0
+    })
+    for col in TARGET_COLUMNS:
+        df[col] = 100.0
+    if unresolved_hours:
+        df.loc[df.index[-unresolved_hours:], TARGET_COLUMNS] = np.nan
+    return df
+
+
+def test_seals_complete_days_and_keeps_open_ones():
+    sealed, recent = split_sealed(to_table(history(10)))
+    assert list(sealed) == [f'2023-01-{day:02d}' for day in range(1, 8)]
+    assert all(part.num_rows == 24 for part in sealed.values())
+    assert recent.num_rows == 72
+
+
+def test_parts_reassemble_the_input():
+    table = to_table(pd.concat([history(6), history(6, 'korangi')]))
+    sealed, recent = split_sealed(table)
+    assert pa.concat_tables(list(sealed.values()) + [recent]).equals(table)
+
+
+def test_unresolved_row_holds_its_day_and_later_days():
+    df = history(4, unresolved_hours=0)
+    df.loc[30, 'target_day2'] = np.nan
+    sealed, recent = split_sealed(to_table(df))
+    # The unresolved row is on day 2 and recent enough to still be filled in
+    assert list(sealed) == ['2023-01-01']
+    assert recent.num_rows == 3 * 24
+
+
+def test_silent_location_does_not_block_sealing():
+    # korangi stopped reporting after 5 days, so its last targets can never resolve
+    df = pd.concat([history(20), history(5, 'korangi')])
+    sealed, recent = split_sealed(to_table(df))
+    assert len(sealed) == 17
+    assert recent.num_rows == 72
+    assert recent['location'].unique().to_pylist() == ['central']
+
+
+def test_stale_unresolved_row_is_sealed_with_its_day():
+    df = history(10, unresolved_hours=0)
+    stale = df['timestamp'] <= df['timestamp'].max() - UNRESOLVABLE_AFTER
+    df.loc[stale[stale].index[-1], 'target_day3'] = np.nan
+    sealed, recent = split_sealed(to_table(df))
+    assert len(sealed) == 9
+    assert recent.num_rows == 24
+
+
+def test_empty_table():
+    sealed, recent = split_sealed(to_table(history(1).iloc[:0]))
+    assert sealed == {} and recent.num_rows == 0
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(dataset_cache, '_manifests', {})
+    monkeypatch.setattr(dataset_cache, '_tables', {})
+    return LocalStorage(str(tmp_path / 'store'))
+
+
+def hourly_runs(storage, readings):
+    """Replay the hourly job: append each hour's rows to the recent shard, fill targets, save"""
+    sealed_per_run, recent_rows = [], []
+    for _, rows in readings.groupby('timestamp', sort=True):
+        dataset_cache.sync(storage, refresh=True)
+        recent = load_recent(storage)
+        recent_rows.append(len(recent))
+        df, _ = fill_targets(normalize(pd.concat([recent, rows], ignore_index=True)))
+        sealed_per_run.append(save_recent(df, storage))
+    dataset_cache.sync(storage, refresh=True)
+    return sealed_per_run, recent_rows
+
+
+def test_hourly_runs_seal_each_day_once_and_keep_recent_bounded(storage):
+    central = history(8, unresolved_hours=0)
+    korangi = history(3, 'korangi', unresolved_hours=0)
+    readings = pd.concat([central, korangi], ignore_index=True).drop(columns=TARGET_COLUMNS)
+    readings['id'] = np.arange(len(readings))
+
+    sealed_per_run, recent_rows = hourly_runs(storage, readings)
+
+    sealed = [date for dates in sealed_per_run for date in dates]
+    assert sealed == sorted(set(sealed))
+    assert sealed == [f'2023-01-{day:02d}' for day in range(1, 6)]
+    assert len(storage.list_files("dataset", prefix=DAILY_SHARD_PREFIX)) == len(sealed)
+    # A location's rows leave the recent shard at most a day after they stop being resolvable
+    assert max(recent_rows) <= 2 * (UNRESOLVABLE_AFTER // HOUR + 24)
+
+    # Sealed shards plus the recent shard hold every reading exactly once, with
+    # the targets a single pass over the whole history would give
+    stored = load_history(storage)
+    expected, _ = fill_targets(normalize(readings))
+    pd.testing.assert_frame_equal(stored, expected)
+
+    # Only the days still waiting on targets stay in the recent shard; the
+    # silent location's unresolvable rows were sealed with their days
+    recent = load_recent(storage)
+    assert recent['location'].unique().tolist() == ['central']
+    assert len(recent) == 3 * 24
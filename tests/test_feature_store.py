@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from feature_store import RollingStore, build_store
+from features import HOUR, ROLLING_COLUMNS, rolling_features
+
+
+def readings(seed=0, hours=600):
+    """Two locations with gaps in their hourly series and missing AQI / PM2.5 values"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for location in ['central', 'korangi']:
+        kept = np.sort(rng.choice(hours, size=hours * 3 // 4, replace=False))
+        aqi = rng.integers(20, 300, len(kept)).astype('float64')
+        pm25 = np.round(rng.uniform(5, 200, len(kept)), 1)
+        aqi[rng.random(len(kept)) < 0.05] = np.nan
+        pm25[rng.random(len(kept)) < 0.05] = np.nan
+        frames.append(pd.DataFrame({'location': location, 'timestamp': kept * HOUR, 'aqi': aqi, 'pm2_5': pm25}))
+    return pd.concat(frames).sort_values(['timestamp', 'location'], kind='stable').reset_index(drop=True)
+
+
+def values(row):
+    return np.array([row[col] for col in ROLLING_COLUMNS], dtype='float64')
+
+
+def expected(df):
+    """rolling_features per location, as training computes them"""
+    out = pd.DataFrame(index=df.index, columns=ROLLING_COLUMNS, dtype='float64')
+    for _, rows in df.groupby('location').groups.items():
+        part = df.loc[rows]
+        columns = rolling_features(part['timestamp'] // HOUR, part['aqi'], part['pm2_5'])
+        for col, values in columns.items():
+            out.loc[rows, col] = values
+    return out
+
+
+def test_ring_buffers_match_training_features():
+    df = readings()
+    store = RollingStore()
+    served = pd.DataFrame([
+        store.push(row.location, row.timestamp, row.aqi, row.pm2_5) for row in df.itertuples(index=False)
+    ])
+    np.testing.assert_array_equal(served[ROLLING_COLUMNS].to_numpy(), expected(df).to_numpy())
+
+
+def test_same_hour_reading_replaces_the_previous_one():
+    df = readings(seed=1, hours=300)
+    store = RollingStore()
+    store.push_frame(df.iloc[:-1])
+    last = df.iloc[-1]
+    store.push(last['location'], last['timestamp'], 999, 499.9)
+    served = store.push(last['location'], last['timestamp'], last['aqi'], last['pm2_5'])
+    np.testing.assert_array_equal(values(served), expected(df).iloc[-1].to_numpy())
+
+
+def test_state_round_trip_and_rebuild():
+    df = readings(seed=2)
+    store = RollingStore()
+    store.push_frame(df)
+    restored = RollingStore.from_json(store.to_json())
+    state = json.loads(store.to_json())
+    assert json.loads(restored.to_json()) == state
+    assert json.loads(build_store(df).to_json()) == state
+
+    hour = int(df['timestamp'].max()) + HOUR
+    for location in ['central', 'korangi']:
+        np.testing.assert_array_equal(values(restored.push(location, hour, 100, 40.0)),
+                                      values(store.push(location, hour, 100, 40.0)))
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from features import HOUR, TARGET_COLUMNS, build_features, fill_targets, first_unresolved
+
+
+def test_targets_and_lags_skip_gaps_instead_of_shifting_rows():
+    n = 24 * 6
+    df = pd.DataFrame({
+        'timestamp': 1672531200 + HOUR * np.arange(n),
+        'location': 'central',
+        'aqi': np.arange(n) + 100,
+        'pm2_5': 35.0
+    })
+    missing = df['timestamp'].iloc[80]
+    df = build_features(df[df['timestamp'] != missing].copy(), overwrite_targets=True)
+    at = df.set_index('timestamp')
+
+    assert np.isnan(at.loc[missing - 24 * HOUR, 'target_day1'])
+    assert np.isnan(at.loc[missing + 24 * HOUR, 'aqi_yesterday'])
+    # Rows past the gap still point at the hour 24h away, not 24 rows away
+    assert at.loc[missing - 23 * HOUR, 'target_day1'] == at.loc[missing + HOUR, 'aqi']
+    assert at.loc[missing + 25 * HOUR, 'aqi_yesterday'] == at.loc[missing + HOUR, 'aqi']
+    assert at[TARGET_COLUMNS].notna().any().all()
+
+
+def test_fill_targets_from_watermark_matches_full_pass():
+    n = 24 * 8
+    df = pd.DataFrame({
+        'timestamp': np.repeat(1672531200 + HOUR * np.arange(n), 2),
+        'location': np.tile(['central', 'korangi'], n),
+        'aqi': np.arange(2 * n) % 250,
+        'pm2_5': 35.0
+    })
+    df = df.drop(index=2 * n - 41).reset_index(drop=True)
+    df, _ = fill_targets(df)
+    df.loc[df.index[-200:], TARGET_COLUMNS] = np.nan
+
+    watermark = first_unresolved(df)
+    full, full_count = fill_targets(df.copy())
+    trailing, trailing_count = fill_targets(df.copy(), start=watermark)
+    assert watermark > 0 and trailing_count == full_count > 0
+    pd.testing.assert_frame_equal(trailing, full)
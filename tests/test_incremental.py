@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+
+from incremental import merge_stats, ridge_from_stats, ridge_stats, update_model
+
+
+def batches(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(50, 20, size=(1500, 5))
+    y = X @ np.array([0.5, -1.0, 2.0, 0.0, 0.3]) + rng.normal(size=len(X))
+    return (X[:1000], y[:1000]), (X[1000:], y[1000:])
+
+
+def test_ridge_from_stats_matches_fit_on_all_rows():
+    (X1, y1), (X2, y2) = batches()
+    model = ridge_from_stats(merge_stats(ridge_stats(X1, y1), ridge_stats(X2, y2)), alpha=1.0)
+    reference = Ridge(alpha=1.0).fit(np.vstack([X1, X2]), np.concatenate([y1, y2]))
+    np.testing.assert_allclose(model.coef_, reference.coef_, rtol=1e-8)
+    np.testing.assert_allclose(model.intercept_, reference.intercept_, rtol=1e-8)
+
+
+def test_update_model_refits_ridge_on_every_row_seen():
+    (X1, y1), (X2, y2) = batches(seed=1)
+    columns = [f'f{i}' for i in range(X1.shape[1])]
+    first = Ridge(alpha=0.5).fit(pd.DataFrame(X1, columns=columns), y1)
+    model, stats = update_model('Ridge', first, pd.DataFrame(X2, columns=columns), y2, ridge_stats(X1, y1))
+    reference = Ridge(alpha=0.5).fit(np.vstack([X1, X2]), np.concatenate([y1, y2]))
+    assert stats['n'] == len(X1) + len(X2)
+    assert list(model.feature_names_in_) == columns
+    np.testing.assert_allclose(model.coef_, reference.coef_, rtol=1e-8)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+import rollups
+from features import HOUR
+
+MONDAY = 1672617600  # 2023-01-02 00:00 UTC
+SUNDAY = MONDAY + 6 * 24 * HOUR
+
+
+def readings(location, start, hours, aqi):
+    return pd.DataFrame({
+        'location': location,
+        'timestamp': start + HOUR * np.arange(hours),
+        'aqi': float(aqi),
+        'pm2_5': float(aqi) / 2
+    })
+
+
+def forecast(timestamp, value):
+    return (pd.Timestamp(timestamp, unit='s'), {f'day{day}': value for day in rollups.TARGET_HORIZONS})
+
+
+def bucket(state, period, location, start):
+    table = state[period]
+    row = table[(table['location'] == location) & (table['period'] == start)]
+    assert len(row) == 1
+    return row.iloc[0]
+
+
+def test_incremental_updates_match_one_summary():
+    runs = [readings(loc, MONDAY + 24 * HOUR * day, 24, 40 + 10 * day + len(loc)) for day in range(10)
+            for loc in ['central', 'korangi']]
+    state = rollups.empty_state()
+    for run in runs:
+        state = rollups.update(state, run)
+
+    everything = pd.concat(runs, ignore_index=True)
+    for period in rollups.PERIODS:
+        expected = rollups.summarize(everything, period).reset_index()
+        table = state[period].sort_values(rollups.KEYS).reset_index(drop=True)
+        expected = expected.sort_values(rollups.KEYS).reset_index(drop=True)
+        for col in rollups.STAT_COLUMNS:
+            np.testing.assert_allclose(table[col], expected[col])
+    # Only the newest week stays open once every location has reached it
+    assert state['open_rows']['timestamp'].min() == MONDAY + 7 * 24 * HOUR
+
+
+def test_lagging_location_catches_up_into_the_previous_week():
+    state = rollups.empty_state()
+    state = rollups.update(state, pd.concat([
+        readings('central', SUNDAY, 24, 100),
+        readings('korangi', SUNDAY, 22, 50)
+    ], ignore_index=True), {'korangi': forecast(SUNDAY - 2 * HOUR, 80.0)})
+
+    # The Monday 00:00 run only reaches central; korangi's fetch fails
+    state = rollups.update(state, readings('central', MONDAY + 7 * 24 * HOUR, 1, 100))
+    assert (state['pending']['location'] == 'korangi').sum() == 3
+
+    # The next run catches korangi up on its last two Sunday hours
+    state = rollups.update(state, readings('korangi', SUNDAY + 22 * HOUR, 2, 200))
+
+    expected_mean = (22 * 50 + 2 * 200) / 24
+    for period, start in [('daily', SUNDAY), ('weekly', MONDAY)]:
+        row = bucket(state, period, 'korangi', start)
+        assert row['count'] == 24
+        assert row['aqi_mean'] == expected_mean
+        assert row['aqi_max'] == 200
+    # The day-1 forecast for Sunday 22:00 matched the caught-up reading
+    daily = bucket(state, 'daily', 'korangi', SUNDAY)
+    assert daily['error_count_day1'] == 1
+    assert daily['abs_error_sum_day1'] == 120
+
+
+def test_forecasts_wait_for_their_target_hour():
+    state = rollups.update(rollups.empty_state(), readings('central', MONDAY, 1, 100),
+                           {'central': forecast(MONDAY, 90.0)})
+    assert sorted(state['pending']['horizon']) == [1, 2, 3]
+
+    state = rollups.update(state, readings('central', MONDAY + HOUR, 48, 110))
+    assert state['pending']['horizon'].tolist() == [3]
+    row = bucket(state, 'weekly', 'central', MONDAY)
+    assert row['abs_error_sum_day1'] == 20 and row['error_count_day1'] == 1
+    assert row['abs_error_sum_day2'] == 20 and row['error_count_day2'] == 1
+    assert row['error_count_day3'] == 0
+
+
+def test_empty_readings_leave_state_untouched():
+    state = rollups.empty_state()
+    assert rollups.update(state, readings('central', MONDAY, 0, 100)) is state
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from xgboost import XGBRegressor
+
+from model_export import forest_arrays, linear_arrays, npz_bytes, xgboost_arrays
+from tree_engine import LinearModel, TreeEnsemble, load_npz
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)).astype('float32')
+    y = 3 * X[:, 0] + np.sin(X[:, 1]) + rng.normal(scale=0.5, size=len(X))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X, y
+
+
+def exported(arrays, tmp_path):
+    """The arrays as the hourly job sees them: written to .npz and memory-mapped back"""
+    path = tmp_path / "model.npz"
+    path.write_bytes(npz_bytes(arrays))
+    return load_npz(str(path))
+
+
+def test_random_forest_matches_sklearn(data, tmp_path):
+    X, y = data
+    model = RandomForestRegressor(n_estimators=30, max_depth=12, random_state=0).fit(X, y)
+    engine = TreeEnsemble(exported(forest_arrays(model), tmp_path))
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(engine.predict(X[0]), model.predict(X[:1]), rtol=1e-12)
+
+
+def test_xgboost_matches_booster(data, tmp_path):
+    X, y = data
+    model = XGBRegressor(n_estimators=80, max_depth=5).fit(X, y)
+    engine = TreeEnsemble(exported(xgboost_arrays(model), tmp_path))
+    # XGBoost sums its leaves in float32
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), atol=1e-4)
+
+
+def test_arrays_are_used_from_the_memory_map(data, tmp_path):
+    X, y = data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    engine = TreeEnsemble(exported(forest_arrays(model), tmp_path))
+    for name in ['children', 'is_leaf', 'feature', 'threshold', 'value', 'default_left']:
+        assert isinstance(getattr(engine, name), np.memmap), name
+
+
+def test_legacy_left_right_arrays(data):
+    X, y = data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    arrays = forest_arrays(model)
+    is_leaf = arrays.pop('is_leaf')
+    children = arrays.pop('children')
+    arrays['left'] = np.where(is_leaf, -1, children[1::2])
+    arrays['right'] = np.where(is_leaf, -1, children[0::2])
+    np.testing.assert_allclose(TreeEnsemble(arrays).predict(X), model.predict(X), rtol=1e-12)
+
+
+def test_linear_model(data):
+    X, y = data
+    X = np.nan_to_num(X).astype('float64')
+    model = Ridge(alpha=1.0).fit(X, y)
+    np.testing.assert_allclose(LinearModel(linear_arrays(model)).predict(X), model.predict(X), rtol=1e-10)
@@ -0,0 +1,135 @@
+"""Array-based inference for the exported models, with no scikit-learn or xgboost import.
+
+A tree ensemble is one set of contiguous node arrays covering every tree,
+stored in the layout the traversal uses so they work straight off the memory map:
+
+    roots          first node of each tree
+    children       children[2 * node + went_left] is the next node (global
+                   indices); leaves point back at themselves
+    is_leaf        whether each node is a leaf
+    feature        feature column tested at each node (0 at leaves)
+    threshold      go left when x <= threshold (float32 x, widened to float64)
+    default_left   direction taken when x is NaN
+    value          leaf outputs
+    bias, scale    prediction = bias + scale * sum of the leaves reached
+
+RandomForest (mean of trees) and XGBoost (base score plus sum of trees) both map
+onto this; model_export.py builds the arrays from the fitted models.
+"""
+import struct
+import zipfile
+
+import numpy as np
+
+# Rows traversed together; bounds the (rows x trees) path arrays
+CHUNK_ROWS = 4096
+
+
+def load_npz(path):
+    """{name: array} for an uncompressed .npz, every member memory-mapped from the file"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} member {info.filename} is compressed and cannot be memory-mapped")
+            # Local file header: 30 fixed bytes, then the name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename.removesuffix('.npy')
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def feature_matrix(X, dtype='float32'):
+    """2-D array from a frame, a 2-D array or a single feature vector"""
+    if hasattr(X, 'to_numpy'):
+        X = X.to_numpy(dtype=dtype, na_value=np.nan)
+    X = np.asarray(X, dtype=dtype)
+    return X[None, :] if X.ndim == 1 else X
+
+
+def node_layout(left, right, feature):
+    """children, is_leaf and feature arrays from per-node child indices (-1 at leaves)"""
+    left = np.asarray(left)
+    node = np.arange(len(left), dtype=left.dtype)
+    is_leaf = left < 0
+    # Leaves point back at themselves so every path can take the same step each level
+    children = np.stack([np.where(is_leaf, node, right), np.where(is_leaf, node, left)], axis=1).ravel()
+    return {'children': children, 'is_leaf': is_leaf, 'feature': np.where(is_leaf, 0, feature)}
+
+
+class TreeEnsemble:
+    def __init__(self, arrays):
+        if 'children' not in arrays:
+            # Artifacts exported with left/right child arrays
+            arrays = dict(arrays, **node_layout(arrays['left'], arrays['right'], arrays['feature']))
+        self.roots = np.asarray(arrays['roots'])
+        self.children = arrays['children']
+        self.is_leaf = arrays['is_leaf']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.max_depth = int(arrays['max_depth'][0])
+        # Forests exported before bias/scale/default_left were added: mean of trees, NaN goes right
+        self.default_left = arrays['default_left'] if 'default_left' in arrays else np.zeros(len(self.is_leaf), dtype=bool)
+        self.bias = float(arrays['bias'][0]) if 'bias' in arrays else 0.0
+        self.scale = float(arrays['scale'][0]) if 'scale' in arrays else 1.0 / len(self.roots)
+
+    def leaves(self, X):
+        """Leaf reached in every tree for each row, shape (rows, trees)"""
+        n_trees = len(self.roots)
+        leaves = np.tile(self.roots, len(X))
+        # One (row, tree) path per entry, indexing the flattened rows
+        path = np.arange(len(leaves))
+        nodes = leaves.copy()
+        offsets = np.repeat(np.arange(len(X)) * X.shape[1], n_trees)
+        has_nan = np.isnan(X).any()
+        X = X.ravel()
+
+        for level in range(self.max_depth):
+            x = X[offsets + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_nan:
+                go_left |= np.isnan(x) & self.default_left[nodes]
+            nodes = self.children[2 * nodes + go_left]
+            # Every few levels, set aside the paths that have reached a leaf
+            if level % 4 == 3:
+                done = self.is_leaf[nodes]
+                if done.any():
+                    leaves[path[done]] = nodes[done]
+                    keep = ~done
+                    nodes, path, offsets = nodes[keep], path[keep], offsets[keep]
+                    if not len(nodes):
+                        break
+        leaves[path] = nodes
+        return leaves.reshape(-1, n_trees)
+
+    def predict(self, X):
+        X = feature_matrix(X)
+        out = np.empty(len(X))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self.leaves(X[start:start + CHUNK_ROWS])
+            out[start:start + len(leaves)] = self.bias + self.scale * self.value[leaves].sum(axis=1)
+        return out
+
+
+class LinearModel:
+    """Ridge prediction from its coefficients"""
+
+    def __init__(self, arrays):
+        self.coef = arrays['coef']
+        self.intercept = float(arrays['intercept'][0])
+
+    def predict(self, X):
+        return feature_matrix(X, 'float64') @ self.coef + self.intercept